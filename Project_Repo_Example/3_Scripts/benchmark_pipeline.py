@@ -0,0 +1,341 @@
+# benchmark_pipeline.py
+# ***************************** Run Notes ***************************** #
+# - Script used to time each stage of post-processing on synthetic      #
+#       tests of any size, so slowdowns in the pipeline are found       #
+#       before they're hit on a test day                                #
+#       + each case in bench_cases sets number of channels, sample rate #
+#           (Hz), & length of test (s); only cases in run_cases are run #
+#                                                                       #
+# - For each case, a synthetic project is written to                    #
+#       bench_dir/Data/<case>: TDMS data file (channel data & 'Events'  #
+#       group), channel_list.csv, Test_Description.csv, & events file   #
+#       + channel list holds every channel type plotted by              #
+#           post_test_plotter_new_VI.py & also assigns each channel a   #
+#           panel & input of a synthetic PXI chassis                    #
+#       + data is deleted once case is done unless keep_data = True     #
+#                                                                       #
+# - Stages timed (each run num_repeats times; best time is reported):   #
+#       + convert: TDMS file to csv (convert_tdms_to_csv)               #
+#       + parse_csv, parse_tdms, parse_cache: load channels in channel  #
+#           list from csv file, TDMS file, & parquet cache              #
+#       + time_base: time relative to ignition & table of events        #
+#       + unit_conversion: convert to engineering units & shift gas     #
+#           data by its lag time                                        #
+#       + filter, stats: filter converted data & compute stats          #
+#       + render: prepare & save chart for every group                  #
+#       + config: build, check, & save .chcfg & NI Max config files     #
+#                                                                       #
+# - Times are saved to report_file (JSON) with size of each case &      #
+#       versions of packages used                                       #
+#       + if report_file already exists, stages that are slower than    #
+#           in that report by more than regression_threshold are        #
+#           printed & listed in new report                              #
+# ********************************************************************* #
+
+# --------------- #
+# Import Packages #
+# --------------- #
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import platform
+import importlib
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+from nptdms import TdmsWriter, ChannelObject
+from tdms_conversion import convert_tdms_to_csv
+from data_loading import build_time_base, get_event_table, get_required_columns, get_sample_timestamps, \
+    load_test_data
+from data_processing import align_lagged_channels, convert_channel_data, filter_channel_data, get_lag_times
+from data_statistics import get_channel_stats
+from channel_config import build_config_data, process_channel_list, write_config_file
+
+# --------------------- #
+# Set Benchmark Options #
+# --------------------- #
+# Dir where synthetic data & report are saved
+script_dir = Path.cwd()
+bench_dir = (script_dir / '..' / '06_Benchmark').resolve()
+report_file = bench_dir / 'benchmark_report.json'
+
+# Each case: number of channels, sample rate (Hz), & length of test (s) after ignition
+bench_cases = {'small': {'num_channels': 40, 'sample_rate': 1, 'duration': 3600},
+               'medium': {'num_channels': 200, 'sample_rate': 10, 'duration': 3600},
+               'full': {'num_channels': 400, 'sample_rate': 10, 'duration': 4 * 3600}}
+
+# Cases to run; 'full' matches a 4-hour, 400-channel, 10 Hz test (needs several GB of memory & disk)
+run_cases = ['small', 'medium']
+
+# Number of times each stage is run (best time is reported)
+num_repeats = 3
+
+# Stage is reported as slower when its time is more than regression_threshold times its time in last report
+regression_threshold = 1.2
+
+# Length (s) of data before ignition
+pre_ignition = 120
+
+# Share of channels of each type; each velocity probe also gets the TC paired with it
+type_mix = {'Temperature': 0.6, 'Velocity': 0.1, 'Differential Pressure': 0.1, 'Heat Flux': 0.1,
+            'Gas': 0.1}
+
+# Number of channels shown on each chart
+channels_per_chart = 8
+
+# Number of rows written to each segment of TDMS file
+write_chunk_rows = 100000
+
+# If true, synthetic data is kept in bench_dir/Data after each case is done
+keep_data = False
+
+# ---------------------- #
+# User-Defined Functions #
+# ---------------------- #
+def get_channel_rows(names, prefix, data_type, scale, offset):
+    # Channel list rows for channels of one type, split into charts of channels_per_chart channels each
+    return([[name, f'{prefix}_{num // channels_per_chart + 1}', data_type, scale, offset]
+            for num, name in enumerate(names)])
+
+def build_channel_list(num_channels):
+    # Build channel list (plotting & chassis columns) with about num_channels channels of each type in type_mix
+    counts = {data_type: max(1, round(share * num_channels)) for data_type, share in type_mix.items()}
+    num_probes = counts['Velocity']
+    num_analyzers = max(1, counts['Gas'] // 3)
+    num_TCs = max(1, counts['Temperature'] - num_probes)
+
+    TC_names = [f'TC{num}' for num in range(1, num_TCs + 1)] + [f'BTC{num}' for num in range(1, num_probes + 1)]
+    channels = get_channel_rows(TC_names, 'TCs', 'Temperature', 1, 0)
+    channels += get_channel_rows([f'BDP{num}' for num in range(1, num_probes + 1)], 'BDP', 'Velocity', 1, 0)
+    channels += get_channel_rows([f'PT{num}' for num in range(1, counts['Differential Pressure'] + 1)], 'Pressure',
+                                 'Differential Pressure', 10, -100)
+    channels += get_channel_rows([f'HF{num}' for num in range(1, counts['Heat Flux'] + 1)], 'Heat_Flux',
+                                 'Heat Flux', 6, 0)
+    for num in range(1, num_analyzers + 1):
+        channels += [[f'O2_{num}', f'GAS{num}_Gas', 'Oxygen', 6.25, 0],
+                     [f'CO_{num}', f'GAS{num}_Gas', 'Carbon Monoxide', 2, 0],
+                     [f'CO2_{num}', f'GAS{num}_Gas', 'Carbon Dioxide', 5, 0]]
+
+    channel_list = pd.DataFrame(channels, columns=['Channel_Name', 'Chart', 'Type', 'Scale', 'Offset'])
+    channel_list.insert(1, 'Label', channel_list['Channel_Name'].str.replace('_', ' '))
+
+    # TCs fill temperature panels & all other channels fill voltage panels that follow them (32 inputs per panel)
+    is_temperature = (channel_list['Type'] == 'Temperature').to_numpy()
+    panel_inputs = np.zeros(len(channel_list), dtype=int)
+    panel_inputs[is_temperature] = np.arange(is_temperature.sum())
+    panel_inputs[~is_temperature] = np.arange((~is_temperature).sum())
+    num_TC_panels = -(-is_temperature.sum() // 32)
+    channel_list['Panel'] = panel_inputs // 32 + 1 + np.where(is_temperature, 0, num_TC_panels)
+    channel_list['Channel'] = panel_inputs % 32
+
+    return(channel_list.set_index('Channel_Name'))
+
+def build_chassis(channel_list):
+    # Build chassis_defs entry (see create_channel_config_file_pxi.py) with a slot for each panel of channel list
+    panel_types = channel_list.groupby('Panel')['Type'].first()
+    panel_types = panel_types.where(panel_types == 'Temperature', 'Voltage')
+    return({'panel_defs': {panel: [panel + 1, ch_type] for panel, ch_type in panel_types.items()},
+            'panel_chans': {panel: [0, 32] for panel in panel_types.index},
+            'channel_lists': '*channel_list.csv',
+            'DAQmxDevice_info': {f'PXI1Slot{panel + 1}': ['PXIe', f'0x{panel:07X}', '0x74B2C4C4',
+                                                          'PXIe-4353' if ch_type == 'Temperature' else 'PXIe-6355',
+                                                          '1', str(panel + 1)]
+                                 for panel, ch_type in panel_types.items()},
+            'DAQmxAccessory_info': {}})
+
+# [value before ignition, rise over first 10 min after ignition] of synthetic raw data of each type
+synthetic_levels = {'Temperature': [20, 580], 'Velocity': [0.1, 0.4], 'Differential Pressure': [10, 0.5],
+                    'Heat Flux': [0.05, 2], 'Oxygen': [4.357, -1.5], 'Carbon Monoxide': [0.1, 1.5],
+                    'Carbon Dioxide': [0.1, 2]}
+
+def get_synthetic_data(channel_list, times, rng):
+    # Synthetic raw data for rows at times (s relative to ignition): fire growth after ignition plus 2% noise
+    levels = np.array([synthetic_levels[data_type] for data_type in channel_list['Type'].values])
+    growth = np.clip(times / 600, 0, 1)[:, None]
+    data = levels[:, 0] + levels[:, 1] * growth
+    return(data * (1 + rng.normal(0, 0.02, data.shape)))
+
+def write_synthetic_test(case_dir, Test_Name, channel_list, case, seed=0):
+    # Write project for case: channel list, test description, events file, & TDMS file in case_dir; returns TDMS path
+    info_dir, data_dir = case_dir / '01_Info', case_dir / '02_Data'
+    (info_dir / 'Events').mkdir(parents=True, exist_ok=True)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    (case_dir / '3_Scripts').mkdir(exist_ok=True)
+    channel_list.to_csv(info_dir / 'channel_list.csv')
+
+    gas_charts = sorted(channel_list.loc[channel_list['Chart'].str.endswith('_Gas'), 'Chart'].unique())
+    test_info = pd.DataFrame({'Test': [Test_Name], 'Config': ['Benchmark']})
+    for num, chart in enumerate(gas_charts):
+        test_info[chart] = 15 + 0.5 * num
+    test_info.to_csv(info_dir / 'Test_Description.csv', index=False)
+
+    pd.DataFrame({'Time': [case['duration'] - 60], 'Event': ['Suppression']}).to_csv(
+        info_dir / 'Events' / f'{Test_Name}_Events.csv', index=False)
+
+    num_rows = int((pre_ignition + case['duration']) * case['sample_rate'])
+    start_time = pd.Timestamp('2020-01-01 12:00:00')
+    event_times = pd.to_timedelta([pre_ignition, pre_ignition + 300], unit='s') + start_time
+    tdms_path = data_dir / f"{Test_Name}_{start_time.strftime('%m%d%Y_%H%M%S')}.tdms"
+    rng = np.random.default_rng(seed)
+
+    # Data is written in segments of write_chunk_rows rows, as DAQ VI appends data during a test
+    with TdmsWriter(tdms_path) as tdms_writer:
+        for start_row in range(0, num_rows, write_chunk_rows):
+            rows = np.arange(start_row, min(start_row + write_chunk_rows, num_rows))
+            timestamps = start_time + pd.to_timedelta(rows / case['sample_rate'], unit='s')
+            data = get_synthetic_data(channel_list, rows / case['sample_rate'] - pre_ignition, rng)
+
+            segment = [ChannelObject('Channels', 'Time',
+                                     np.array(timestamps.strftime('%Y-%m-%d %H:%M:%S.%f').str[:-3], dtype=str))]
+            segment += [ChannelObject('Channels', channel, data[:, col])
+                        for col, channel in enumerate(channel_list.index.values)]
+            if start_row == 0:
+                segment += [ChannelObject('Events', 'Time', np.array(event_times.strftime('%Y-%m-%dT%H:%M:%S'), dtype=str)),
+                            ChannelObject('Events', 'Event', np.array(['Ignition', 'Door open']))]
+            tdms_writer.write_segment(segment)
+
+    return(tdms_path)
+
+def time_stage(stage_times, stage, function, *args):
+    # Run function num_repeats times, recording time (s) of each run under stage; returns output of last run
+    stage_times[stage] = []
+    for repeat in range(num_repeats):
+        start = time.perf_counter()
+        output = function(*args)
+        stage_times[stage].append(time.perf_counter() - start)
+
+    print(f'  {stage:<16} {min(stage_times[stage]):9.3f} s')
+    return(output)
+
+def run_case(case_name, case):
+    # Write synthetic data for case & time each stage of pipeline on it; returns dict for report
+    case_dir = bench_dir / 'Data' / case_name
+    if case_dir.exists():
+        shutil.rmtree(case_dir)
+    Test_Name = f'Bench_{case_name}'
+    channel_list = build_channel_list(case['num_channels'])
+
+    print(f"--- Writing {case_name} case ({len(channel_list)} channels, {case['sample_rate']} Hz, "
+          f"{case['duration']} s) ---")
+    tdms_path = write_synthetic_test(case_dir, Test_Name, channel_list, case)
+
+    # Plotter reads channel list & test description of case on import (relative to working dir)
+    os.chdir(case_dir / '3_Scripts')
+    if 'post_test_plotter_new_VI' in sys.modules:
+        plotter = importlib.reload(sys.modules['post_test_plotter_new_VI'])
+    else:
+        plotter = importlib.import_module('post_test_plotter_new_VI')
+
+    print(f'--- Timing {case_name} case ---')
+    stage_times = {}
+    data_dir = plotter.data_dir.resolve()
+    csv_path = data_dir / f'{Test_Name}.csv'
+    columns = get_required_columns(plotter.channel_list)
+    float_dtype = plotter.data_float_dtype
+
+    time_stage(stage_times, 'convert', convert_tdms_to_csv, tdms_path, csv_path, Test_Name, plotter.tdms_chunk_rows)
+    time_stage(stage_times, 'parse_csv', load_test_data, csv_path, columns, False, float_dtype)
+    exp_data = time_stage(stage_times, 'parse_tdms', load_test_data, tdms_path, columns, False, float_dtype)
+    cache_path = data_dir / f'{Test_Name}.parquet'
+    load_test_data(tdms_path, columns, True, float_dtype, cache_path)
+    time_stage(stage_times, 'parse_cache', load_test_data, tdms_path, columns, True, float_dtype, cache_path)
+
+    def get_time_base(exp_data):
+        timestamps = get_sample_timestamps(exp_data['Time'])
+        times = build_time_base(timestamps, exp_data['Event'], 'Ignition')
+        return(times, get_event_table(times, timestamps, exp_data['Event'],
+                                      plotter.get_event_sources(Test_Name, tdms_path)))
+    times, event_table = time_stage(stage_times, 'time_base', get_time_base, exp_data)
+    exp_data = exp_data.drop(columns='Time').set_index(pd.Index(times, name='Time'))
+
+    def convert_units(exp_data):
+        lag_times = get_lag_times(plotter.channel_list, plotter.test_info, Test_Name)
+        converted_data = convert_channel_data(exp_data, plotter.channel_list, lag_times)
+        return(align_lagged_channels(converted_data, lag_times))
+    converted_data = time_stage(stage_times, 'unit_conversion', convert_units, exp_data)
+    filtered_data = time_stage(stage_times, 'filter', filter_channel_data, converted_data, plotter.channel_list)
+    time_stage(stage_times, 'stats', get_channel_stats, filtered_data, plotter.channel_list)
+
+    def render_charts(filtered_data):
+        save_dir = plotter.plot_dir / Test_Name
+        save_dir.mkdir(parents=True, exist_ok=True)
+        for group in plotter.channel_groups.groups:
+            plotter.render_group_plot(plotter.prep_group_plot(filtered_data, group, event_table),
+                                      save_dir / f'{group}.pdf')
+    time_stage(stage_times, 'render', render_charts, filtered_data)
+
+    chassis = build_chassis(plotter.channel_list)
+    def build_config_files():
+        write_config_file(case_dir / '01_Info' / 'PXI1_configData.txt', build_config_data('PXI1', chassis, [19, 5]))
+        return(process_channel_list('PXI1', chassis, case_dir / '01_Info' / 'channel_list.csv'))
+    time_stage(stage_times, 'config', build_config_files)
+
+    case_report = {**case, 'num_rows': len(exp_data), 'num_channels': len(channel_list),
+                   'num_charts': len(plotter.channel_groups.groups),
+                   'tdms_size_MB': round(tdms_path.stat().st_size / 1e6, 1),
+                   'csv_size_MB': round(csv_path.stat().st_size / 1e6, 1),
+                   'stages': {stage: {'best_s': round(min(run_times), 4), 'times_s': [round(t, 4) for t in run_times]}
+                              for stage, run_times in stage_times.items()}}
+
+    os.chdir(script_dir)
+    if not keep_data:
+        shutil.rmtree(case_dir)
+    print()
+
+    return(case_report)
+
+def get_regressions(report, old_report):
+    # List stages slower than in old report by more than regression_threshold
+    regressions = []
+    for case_name, case_report in report['cases'].items():
+        old_case = old_report.get('cases', {}).get(case_name)
+        if old_case is None or old_case['num_rows'] != case_report['num_rows'] or \
+                old_case['num_channels'] != case_report['num_channels']:
+            continue
+        for stage, stage_report in case_report['stages'].items():
+            old_time = old_case['stages'].get(stage, {}).get('best_s')
+            if old_time and stage_report['best_s'] > regression_threshold * old_time:
+                regressions.append({'case': case_name, 'stage': stage, 'old_s': old_time,
+                                    'new_s': stage_report['best_s'],
+                                    'ratio': round(stage_report['best_s'] / old_time, 2)})
+
+    return(regressions)
+
+def get_package_versions():
+    # Versions of packages used by pipeline
+    versions = {'python': platform.python_version()}
+    for package in ['numpy', 'pandas', 'scipy', 'matplotlib', 'nptdms', 'pyarrow']:
+        try:
+            versions[package] = importlib.import_module(package).__version__
+        except ImportError:
+            versions[package] = None
+
+    return(versions)
+
+# ----------------- #
+# Main Body of Code #
+# ----------------- #
+if __name__ == '__main__':
+    bench_dir.mkdir(parents=True, exist_ok=True)
+
+    report = {'created': datetime.now().isoformat(timespec='seconds'), 'host': socket.gethostname(),
+              'platform': platform.platform(), 'cpu_count': os.cpu_count(), 'versions': get_package_versions(),
+              'num_repeats': num_repeats, 'cases': {}}
+    for case_name in run_cases:
+        report['cases'][case_name] = run_case(case_name, bench_cases[case_name])
+
+    # Compare with last report before replacing it
+    if report_file.exists():
+        with open(report_file) as old_file:
+            report['regressions'] = get_regressions(report, json.load(old_file))
+        for regression in report['regressions']:
+            print(f"--- {regression['case']} {regression['stage']} is {regression['ratio']}x slower than last "
+                  f"report ({regression['old_s']} s -> {regression['new_s']} s) ---")
+
+    with open(report_file, 'w') as report_json:
+        json.dump(report, report_json, indent=4)
+    print(f'Saved {report_file}')
@@ -0,0 +1,341 @@
+# channel_config.py
+# ******************************* Run Notes ******************************* #
+# - Functions used by create_channel_config_file_pxi.py to build .chcfg     #
+#       files for the PXI DAQ & .txt config files to import into NI Max     #
+#                                                                           #
+# - Each chassis is described by a dict (see chassis_defs in                #
+#       create_channel_config_file_pxi.py) with:                            #
+#       + 'panel_defs': panel numbers as keys corresponding to array with   #
+#           [slot num, channel type]                                        #
+#       + 'panel_chans': panel numbers as keys corresponding to array that  #
+#           defines channel inputs of attached module                       #
+#       + 'channel_lists': pattern matching names of channel lists for      #
+#           chassis (case is ignored)                                       #
+#       + 'DAQmxDevice_info' & 'DAQmxAccessory_info': hardware info used    #
+#           for NI Max config file                                          #
+#                                                                           #
+# - Files are built in memory as one string & written with a single call    #
+#       + channel list is compiled into a table indexed by (panel, input)   #
+#           & strings for each channel type are resolved once, so no        #
+#           pandas lookups are made per channel                             #
+#       + each channel list is independent, so several can be processed     #
+#           in parallel with process_channel_list                           #
+#                                                                           #
+# - Existing .chcfg & NI Max config files can be parsed back to tables &    #
+#       checked against the channel list & chassis they were built from     #
+#       + channel lists are checked for repeated names or inputs, panels    #
+#           missing from panel_defs, inputs outside of panel ranges, &      #
+#           types that don't match their panel                              #
+#       + .chcfg files are checked for repeated physical channels & names,  #
+#           & compared field by field with file built from channel list     #
+#       + each .chcfg file built is checked the same way before it's        #
+#           written, so panel_defs or panel_chans that map two panels to    #
+#           the same inputs are reported                                    #
+#       + NI Max files are checked for repeated physical channels & slots   #
+#           without a device                                                #
+# ************************************************************************* #
+
+# -------------- #
+# Import Modules #
+# -------------- #
+import re
+import numpy as np
+import pandas as pd
+
+# Channel types that only alarm on high values
+gas_types = ['Oxygen', 'Carbon_Monoxide', 'Carbon_Dioxide']
+
+# Lines of .chcfg file that define channel array entries ('Valid Channel Arrray N.Field = Value')
+chcfg_line_pattern = re.compile(r'^Valid Channel Arrray (\d+)\.(.+?) = (.*?)\r?$', re.MULTILINE)
+
+# ----------------------- #
+# Define Custom Functions #
+# ----------------------- #
+# Get headers for NI Max config file based on channel type
+def get_DAQmxChannel_headers(ch_type):
+    if ch_type == 'Temperature':
+        return(['[DAQmxChannel]', 'AI.AutoZeroMode', 'AI.Max', 'AI.MeasType', 'AI.Min',
+                'AI.OpenThrmcplDetectEnable', 'AI.Temp.Units', 'AI.Thrmcpl.CJCChan', 'AI.Thrmcpl.CJCSrc',
+                'AI.Thrmcpl.CJCVal', 'AI.Thrmcpl.Type', 'ChanType', 'Descr', 'PhysicalChanName', ''])
+
+    elif ch_type == 'Voltage':
+        return(['[DAQmxChannel]', 'AI.Max', 'AI.MeasType', 'AI.Min', 'AI.TermCfg',
+                'AI.Voltage.Units', 'ChanType', 'Descr', 'PhysicalChanName', ''])
+
+# Get DAQmxChannel row inputs for NI Max config file given channel label, physical name, & type
+def get_DAQmxChannel_row(ch_label, phys_name, ch_type):
+    if ch_type == 'Temperature':
+        return([ch_label, 'Every Sample', '1372', f'{ch_type}:Thermocouple', '-200', '1',
+                      'Deg C', '', 'Built-In', '25', 'K', 'Analog Input', '', phys_name, ''])
+
+    elif ch_type == 'Voltage':
+        return([ch_label, '10', ch_type, '-10', 'RSE', 'Volts', 'Analog Input', '', phys_name, ''])
+
+# Function to get alarm ranges and units for different channel types
+def get_channel_vars(ch_type):
+    if ch_type == 'Temperature':
+        function = '"Thermocouple (K)"'
+        units = '"C"'
+        low_alarm_str = '"-17.777800"'
+        high_alarm_str = '"1230.00000"'
+        min_value_str = '"-245.729755"'
+        max_value_str = '"1232.065825"'
+    elif ch_type == 'Heat_Flux':
+        function = '"Voltage"'
+        units = '"V"'
+        low_alarm_str = '"-0.099000"'
+        high_alarm_str = '"0.099000"'
+        min_value_str = '"-0.100000"'
+        max_value_str = '"0.100000"'
+    elif ch_type in ['Wind_Direction', 'Wind_Velo']:
+        function = '"Voltage"'
+        units = '"V"'
+        low_alarm_str = '"-0.099000"'
+        high_alarm_str = '"9.999000"'
+        min_value_str = '"-10.00000"'
+        max_value_str = '"10.00000"'
+    elif ch_type in gas_types:
+        function = '"Voltage"'
+        units = '"V"'
+        low_alarm_str = '"-0.099000"'
+        high_alarm_str = '"4.999000"'
+        min_value_str = '"-10.00000"'
+        max_value_str = '"10.00000"'
+    else:
+        function = '"Voltage"'
+        units = '"V"'
+        low_alarm_str = '"-9.9990000"'
+        high_alarm_str = '"9.999000"'
+        min_value_str = '"-10.000000"'
+        max_value_str = '"10.000000"'
+
+    return(function, units, low_alarm_str, high_alarm_str, min_value_str, max_value_str)
+
+def get_channel_records(channel_types):
+    # Resolve function, units, alarm type, alarm limits, & min/max strings for each channel type once
+    records = {}
+    for ch_type in set(channel_types):
+        function, units, low_alarm, high_alarm, min_value, max_value = get_channel_vars(ch_type)
+        alarm = 'High Only' if ch_type in gas_types else 'High and Low'
+        records[ch_type] = (function, units, alarm, low_alarm, high_alarm, min_value, max_value)
+
+    return(records)
+
+def compile_channel_table(chassis, channel_list):
+    # Compile channel list into dense arrays of name, type, & use of each (panel, input) of chassis
+    #   + rows follow order of panel_defs; inputs without a channel keep default name & panel type
+    #   + channels on panels not in panel_defs or inputs outside of panel's range are left out
+    panel_IDs = list(chassis['panel_defs'])
+    panel_sizes = np.array([end_range - start_range for start_range, end_range in chassis['panel_chans'].values()])
+    table_shape = (len(panel_IDs), panel_sizes.max())
+
+    names = np.array([[f'Pan{int(pan_ID):02d}Ch{ch_num:02d}' for ch_num in range(table_shape[1])]
+                      for pan_ID in panel_IDs], dtype=object)
+    types = np.repeat(np.array([[chassis['panel_defs'][pan_ID][1]] for pan_ID in panel_IDs], dtype=object),
+                      table_shape[1], axis=1)
+    in_use = np.zeros(table_shape, dtype=bool)
+
+    panel_rows = pd.Series(np.arange(len(panel_IDs)), index=[int(pan_ID) for pan_ID in panel_IDs])
+    rows = channel_list['Panel'].map(panel_rows).to_numpy()
+    inputs = channel_list['Channel'].to_numpy(dtype=float)
+    valid = ~np.isnan(rows) & (inputs >= 0)
+    valid[valid] = inputs[valid] < panel_sizes[rows[valid].astype(int)]
+    rows, inputs = rows[valid].astype(int), inputs[valid].astype(int)
+
+    names[rows, inputs] = channel_list.index.values[valid]
+    types[rows, inputs] = channel_list['Type'].values[valid]
+    in_use[rows, inputs] = True
+
+    return(names, types, in_use)
+
+def build_chcfg(sys_ID, chassis, channel_list):
+    # Build text of .chcfg file for channel list (indexed by channel name with 'Panel', 'Channel', & 'Type' columns)
+    panel_defs, panel_chans = chassis['panel_defs'], chassis['panel_chans']
+    num_of_channels = sum(end_range - start_range for start_range, end_range in panel_chans.values())
+    names, types, in_use = compile_channel_table(chassis, channel_list)
+    records = get_channel_records(types.ravel())
+
+    chcfg_text = ['[Saved Channels IN]\n', f'Valid Channel Arrray.<size(s)> = "{num_of_channels}"\n']
+    channel_array_ID = 0
+    for row, (pan_ID, (slot_num, default_input_type)) in enumerate(panel_defs.items()):
+        start_range, end_range = panel_chans[pan_ID]
+        panel_size = end_range - start_range
+        for ch_num, name, ch_type, use in zip(range(panel_size), names[row, :panel_size].tolist(),
+                                              types[row, :panel_size].tolist(), in_use[row, :panel_size].tolist()):
+            function, units, alarm, low_alarm, high_alarm, min_value, max_value = records[ch_type]
+            line_start = f'Valid Channel Arrray {channel_array_ID}.'
+            chcfg_text.append(f'{line_start}Use? = "{"TRUE" if use else "FALSE"}"\n'
+                              f'{line_start}Channel Name = "{name}"\n'
+                              f'{line_start}Channel Function = {function}\n'
+                              f'{line_start}Units = {units}\n'
+                              f'{line_start}Physical Channel = "{sys_ID}Slot{slot_num}/ai{ch_num + start_range}"\n'
+                              f'{line_start}DAQmx Global Channel = "\\00\\00\\00\tPan{int(pan_ID):02d}Ch{ch_num:02d}"\n'
+                              f'{line_start}Alarm Info.Alarm = "{alarm}"\n'
+                              f'{line_start}Alarm Info.Low Limit = {low_alarm}\n'
+                              f'{line_start}Alarm Info.High Limit = {high_alarm}\n'
+                              f'{line_start}Min = {min_value}\n'
+                              f'{line_start}Max = {max_value}\n')
+            channel_array_ID += 1
+
+    return(''.join(chcfg_text))
+
+def build_config_data(sys_ID, chassis, DAQmx_version):
+    # Build text of NI Max config data file for chassis
+    lines = ['\t'.join(['[DAQmx]', 'MajorVersion', 'MinorVersion', '']),
+             '\t'.join(['', str(DAQmx_version[0]), str(DAQmx_version[1]), ''])]
+
+    # Write DAQmxChannel lines for channels on each panel; headers are written when channel type changes
+    last_ch_type = 'None'
+    for pan_num, (slot_num, ch_type) in chassis['panel_defs'].items():
+        if ch_type != last_ch_type:
+            lines += ['', '\t'.join(get_DAQmxChannel_headers(ch_type))]
+
+        # Add row for each channel on given panel
+        start_range, end_range = chassis['panel_chans'][pan_num]
+        for devc_ch_num in range(start_range, end_range):
+            if ch_type == 'Voltage':
+                ch_label = f'Pan{int(pan_num):02d}Ch{devc_ch_num - start_range:02d}'
+            else:
+                ch_label = f'Pan{int(pan_num):02d}Ch{devc_ch_num:02d}'
+            phys_name = f'{sys_ID}Slot{slot_num}/ai{devc_ch_num}'
+            lines.append('\t'.join(get_DAQmxChannel_row(ch_label, phys_name, ch_type)))
+
+        last_ch_type = ch_type
+
+    # Add DAQmxDevice & DAQmxAccessory headers & rows using info provided for chassis
+    lines += ['', '\t'.join(['[DAQmxDevice]', 'BusType', 'DevSerialNum', 'ProductNum', 'ProductType',
+                             'PXI.ChassisNum', 'PXI.SlotNum', ''])]
+    lines += ['\t'.join([device] + device_info + ['']) for device, device_info in chassis['DAQmxDevice_info'].items()]
+    lines += ['', '\t'.join(['[DAQmxAccessory]', 'Accessory.SerialNum', ''])]
+    lines += ['\t'.join([accessory, serial_num, '']) for accessory, serial_num in chassis['DAQmxAccessory_info'].items()]
+
+    return('\n'.join(lines) + '\n\n')
+
+def write_config_file(file_path, text):
+    # Write text of config file in one call
+    with open(file_path, 'w') as config_file:
+        config_file.write(text)
+
+def parse_chcfg(chcfg_text):
+    # Parse text of .chcfg file to df with a row for each channel array entry & a column for each field
+    #   + quotes around values are removed
+    entries = chcfg_line_pattern.findall(chcfg_text)
+    if not entries:
+        return(pd.DataFrame(index=pd.Index([], name='Array', dtype=int)))
+
+    chcfg_df = pd.DataFrame(entries, columns=['Array', 'Field', 'Value'])
+    chcfg_df['Array'] = chcfg_df['Array'].astype(int)
+    chcfg_df['Value'] = chcfg_df['Value'].str.strip('"')
+    return(chcfg_df.pivot(index='Array', columns='Field', values='Value')[list(dict.fromkeys(chcfg_df['Field']))])
+
+def parse_config_data(config_text):
+    # Parse text of NI Max config data file to dict of df for each section (e.g. 'DAQmxChannel', 'DAQmxDevice')
+    #   + blocks of the same section with different headers are combined; fields missing from a block are ''
+    section_blocks = {}
+    for block in re.split(r'\r?\n\s*\r?\n', config_text.strip()):
+        block_lines = [line.split('\t') for line in block.splitlines()]
+        header = block_lines[0]
+        section = header[0].strip('[]')
+        block_df = pd.DataFrame([row[:len(header)] for row in block_lines[1:]], columns=header)
+        section_blocks.setdefault(section, []).append(block_df.rename(columns={header[0]: 'Name'}).drop(columns=''))
+
+    return({section: pd.concat(blocks, ignore_index=True).fillna('') for section, blocks in section_blocks.items()})
+
+def diff_chcfg(old_chcfg, new_chcfg):
+    # List fields that differ between parsed .chcfg files as df of 'Array', 'Field', 'Old', & 'New' values
+    old_values = old_chcfg.stack().rename('Old')
+    new_values = new_chcfg.stack().rename('New')
+    chcfg_diff = pd.concat([old_values, new_values], axis=1).fillna('(missing)')
+    chcfg_diff = chcfg_diff[chcfg_diff['Old'] != chcfg_diff['New']]
+    return(chcfg_diff.rename_axis(['Array', 'Field']).reset_index())
+
+def validate_channel_list(chassis, channel_list):
+    # Check channel list against chassis; returns df of 'Channel' & 'Issue' for each problem found
+    panel_types = {int(pan_ID): ch_type for pan_ID, (slot_num, ch_type) in chassis['panel_defs'].items()}
+    panel_sizes = {int(pan_ID): end_range - start_range for pan_ID, (start_range, end_range) in chassis['panel_chans'].items()}
+    panels = channel_list['Panel']
+    inputs = channel_list['Channel']
+    on_panel = panels.isin(list(panel_types))
+    panel_type = panels.map(panel_types)
+    is_temperature = channel_list['Type'] == 'Temperature'
+
+    checks = [[channel_list.index.duplicated(keep=False), 'Channel name used more than once'],
+              [channel_list.duplicated(['Panel', 'Channel'], keep=False),
+               'Panel & input used by more than one channel'],
+              [~on_panel, 'Panel not in panel_defs'],
+              [on_panel & ((inputs < 0) | (inputs >= panels.map(panel_sizes))), "Input outside of panel's range"],
+              [on_panel & (panel_type == 'Temperature') & ~is_temperature,
+               'Type is not Temperature but panel is Temperature'],
+              [on_panel & (panel_type != 'Temperature') & is_temperature,
+               'Type is Temperature but panel is Voltage']]
+
+    issues = [pd.DataFrame({'Channel': channel_list.index[np.asarray(failed)], 'Issue': issue}) for failed, issue in checks]
+    return(pd.concat(issues, ignore_index=True))
+
+def validate_chcfg(chcfg_df):
+    # Check parsed .chcfg file for physical channels & names of channels in use defined more than once
+    in_use = chcfg_df['Use?'] == 'TRUE'
+    checks = [[chcfg_df['Physical Channel'].duplicated(keep=False), 'Physical channel defined more than once'],
+              [in_use & chcfg_df['Channel Name'].where(in_use).duplicated(keep=False),
+               'Channel name used more than once']]
+
+    issues = [pd.DataFrame({'Channel': chcfg_df.loc[np.asarray(failed), 'Channel Name'].values,
+                            'Issue': issue}) for failed, issue in checks]
+    return(pd.concat(issues, ignore_index=True))
+
+def validate_config_data(sys_ID, chassis, config_data):
+    # Check parsed NI Max config data for duplicate physical channels & slots in panel_defs without a device
+    issues = []
+    channel_df = config_data.get('DAQmxChannel', pd.DataFrame(columns=['Name', 'PhysicalChanName']))
+    duplicated = channel_df['PhysicalChanName'].duplicated(keep=False)
+    issues.append(pd.DataFrame({'Channel': channel_df.loc[duplicated, 'Name'].values,
+                                'Issue': 'Physical channel defined more than once'}))
+
+    devices = set(config_data.get('DAQmxDevice', pd.DataFrame(columns=['Name']))['Name'])
+    missing_devices = sorted({f'{sys_ID}Slot{slot_num}' for slot_num, ch_type in chassis['panel_defs'].values()} - devices)
+    issues.append(pd.DataFrame({'Channel': missing_devices, 'Issue': 'Slot in panel_defs has no DAQmxDevice'}))
+
+    return(pd.concat(issues, ignore_index=True))
+
+def format_issues(issues):
+    # Format df of issues (or differences) as indented lines to print
+    return(''.join(f'\n    {row}' for row in issues.to_string(index=False).splitlines()))
+
+def process_channel_list(sys_ID, chassis, channel_list_path, validate_only=False):
+    # Check channel list & build .chcfg file next to it; returns message to print
+    #   + if validate_only, .chcfg file is instead read & compared with one built from channel list
+    channel_list = pd.read_csv(channel_list_path, index_col='Channel_Name')
+    chcfg_path = channel_list_path.with_suffix('.chcfg')
+    chcfg_text = build_chcfg(sys_ID, chassis, channel_list)
+
+    messages = []
+    issues = validate_channel_list(chassis, channel_list)
+    if not issues.empty:
+        messages.append(f'{len(issues)} issue(s) found in {channel_list_path.name}:' + format_issues(issues))
+
+    if not validate_only:
+        issues = validate_chcfg(parse_chcfg(chcfg_text))
+        if not issues.empty:
+            messages.append(f'{len(issues)} issue(s) found in {chcfg_path.name} built for {sys_ID}:' + format_issues(issues))
+        write_config_file(chcfg_path, chcfg_text)
+        messages.append(f'Created {chcfg_path.name} for {sys_ID} from {channel_list_path.name}')
+        return('\n'.join(messages))
+
+    if not chcfg_path.exists():
+        messages.append(f'{chcfg_path.name} not found')
+        return('\n'.join(messages))
+
+    with open(chcfg_path) as chcfg_file:
+        old_chcfg = parse_chcfg(chcfg_file.read())
+    issues = validate_chcfg(old_chcfg)
+    if not issues.empty:
+        messages.append(f'{len(issues)} issue(s) found in {chcfg_path.name}:' + format_issues(issues))
+
+    chcfg_diff = diff_chcfg(old_chcfg, parse_chcfg(chcfg_text))
+    if chcfg_diff.empty:
+        messages.append(f'{chcfg_path.name} matches {channel_list_path.name} for {sys_ID}')
+    else:
+        messages.append(f'{len(chcfg_diff)} field(s) of {chcfg_path.name} differ from {channel_list_path.name} '
+                        f'for {sys_ID}:' + format_issues(chcfg_diff))
+
+    return('\n'.join(messages))
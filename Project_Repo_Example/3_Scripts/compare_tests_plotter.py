@@ -0,0 +1,210 @@
+# compare_tests_plotter.py
+# ***************************** Run Notes ***************************** #
+# - Script used to plot the same chart groups for several tests on      #
+#       shared axes                                                     #
+#       + tests are grouped by their value in compare_column of         #
+#           Test_Description.csv (e.g. 'Config'); each value shared by  #
+#           2 or more tests is compared                                 #
+#       + for each chart group, an overlay chart (every channel of      #
+#           every test) & a mean chart (mean of tests with min/max      #
+#           band) are saved to plot_dir/Comparisons/<column>_<value>    #
+#                                                                       #
+# - Data is read from multi-test store in store_dir (see data_store.py) #
+#       & tests are aligned on time relative to ignition                #
+#       + converted & filtered data for each test is cached in the      #
+#           test's store directory & reused until its data, channel     #
+#           list rows, row of test description, filters, or             #
+#           align_gas_data change                                       #
+#       + stats of every channel of every test (Series_Stats.csv) &     #
+#           their mean, std, min, & max across tests                    #
+#           (Series_Stats_Summary.csv) are saved for each value         #
+#       + mean & band are computed after interpolating each test onto   #
+#           the time steps of the first test, over the time range       #
+#           shared by all tests                                         #
+#                                                                       #
+# - Channel list, test description, & plot parameters are imported      #
+#       from post_test_plotter_new_VI.py                                #
+# ********************************************************************* #
+
+# --------------- #
+# Import Packages #
+# --------------- #
+import numpy as np
+from matplotlib.figure import Figure
+from itertools import cycle
+from data_loading import get_test_files, pq, read_cache, write_cache
+from data_processing import align_lagged_channels, convert_channel_data, default_filters, filter_channel_data, get_lag_times
+from data_statistics import get_channel_stats, get_series_stats
+from data_store import load_test_from_store, read_store_index, update_store
+from post_test_plotter_new_VI import channel_list, channel_groups, data_dir, plot_dir, store_dir, test_info, \
+    line_markers, line_width, label_size, fig_width, fig_height, use_data_cache, data_float_dtype, align_gas_data, \
+    format_and_save_plot, get_decimated_rows, get_hash, get_marker_spacing, type_labels
+
+# ---------------------- #
+# Set Compare Parameters #
+# ---------------------- #
+# Column of Test_Description.csv used to group tests
+compare_column = 'Config'
+
+# Values of compare_column to compare; set to None to compare every value shared by 2 or more tests
+compare_values = None
+
+# Chart groups to compare; set to None to compare every group in channel list
+compare_groups = None
+
+compare_dir = plot_dir / 'Comparisons'
+
+# ---------------------- #
+# User-Defined Functions #
+# ---------------------- #
+def get_compare_sets(store_index):
+    # Get tests in store for each value of compare_column shared by 2 or more of them
+    stored_tests = test_info[test_info.index.isin(list(store_index))]
+    compare_sets = {}
+    for value, value_tests in stored_tests.groupby(compare_column):
+        if len(value_tests) > 1 and (compare_values is None or value in compare_values):
+            compare_sets[value] = list(value_tests.index.values)
+
+    return(compare_sets)
+
+def get_filtered_test_data(Test_Name, compare_channels, store_index):
+    # Get converted & filtered data for test from its cache if current, otherwise from data in store
+    missing_channels = [channel for channel in get_store_columns(compare_channels)
+                        if channel not in store_index[Test_Name]['channels']]
+    if missing_channels:
+        print(f"  {Test_Name} skipped (missing {', '.join(missing_channels)})")
+        return(None)
+
+    cache_path = store_dir / Test_Name / 'filtered_data.parquet'
+    cache_key = get_hash(store_index[Test_Name]['source_key'], compare_channels.to_csv(),
+                         test_info.loc[Test_Name].to_json(), default_filters, align_gas_data)
+    columns = ['Time'] + list(compare_channels.index.values)
+    if use_data_cache and pq is not None:
+        filtered_data = read_cache(cache_path, cache_key, columns)
+        if filtered_data is not None:
+            return(filtered_data.set_index('Time'))
+
+    exp_data = load_test_from_store(store_dir, Test_Name, get_store_columns(compare_channels))
+    lag_times = get_lag_times(compare_channels, test_info, Test_Name)
+    converted_data = convert_channel_data(exp_data, compare_channels, lag_times)
+    if align_gas_data:
+        converted_data = align_lagged_channels(converted_data, lag_times)
+    filtered_data = filter_channel_data(converted_data, compare_channels)
+    print(f'  Converted & filtered {Test_Name}')
+
+    if use_data_cache and pq is not None:
+        write_cache(filtered_data.reset_index(), cache_path, cache_key)
+
+    return(filtered_data)
+
+def get_store_columns(compare_channels):
+    # Get raw data channels needed to convert channels, including TC paired with each velocity probe
+    columns = list(compare_channels.index.values)
+    for channel in compare_channels.index[compare_channels['Type'] == 'Velocity']:
+        columns.append(channel[0] + 'TC' + channel[3:])
+
+    return(list(dict.fromkeys(columns)))
+
+def get_mean_and_band(test_data, channel):
+    # Interpolate channel of each test onto time steps of first test; returns (times, mean, min, max)
+    channel_data = [data[channel].dropna() for data in test_data.values()]
+    start_time = max(data.index.values[0] for data in channel_data)
+    end_time = min(data.index.values[-1] for data in channel_data)
+    times = channel_data[0].index.values
+    times = times[(times >= start_time) & (times <= end_time)]
+
+    aligned_data = np.array([np.interp(times, data.index.values, data.values) for data in channel_data])
+    return(times, aligned_data.mean(axis=0), aligned_data.min(axis=0), aligned_data.max(axis=0))
+
+def get_axis_limits(y_data, x_max):
+    # Get axis limits covering all data, padded the same way as charts of single tests
+    y_min = min(0, min(np.nanmin(data) - abs(np.nanmin(data) * .1) for data in y_data))
+    y_max = max(0, max(np.nanmax(data) * 1.1 for data in y_data))
+    return([y_min, y_max], [0, x_max])
+
+def plot_overlay(test_data, group, file_loc):
+    # Plot every channel of group for every test; color shows test & marker shows channel
+    fig = Figure(figsize=(fig_width, fig_height))
+    ax1 = fig.add_subplot()
+    y_data, x_max = [], 0
+
+    for test_num, (Test_Name, filtered_data) in enumerate(test_data.items()):
+        plot_markers = cycle(line_markers)
+        for channel in channel_groups.get_group(group).index.values:
+            plot_data = filtered_data[channel].dropna()
+            rows = get_decimated_rows(plot_data.values)
+            ax1.plot(plot_data.index.values[rows], plot_data.values[rows], color=f'C{test_num}', lw=line_width,
+                     marker=next(plot_markers), markevery=get_marker_spacing(len(plot_data), len(rows)), mew=3,
+                     mec='none', ms=7,
+                     label=f"{Test_Name.replace('_', ' ')} {channel_list.loc[channel, 'Label']}")
+            y_data.append(plot_data.values)
+            x_max = max(x_max, plot_data.index.values[-1])
+
+    y1_label, y2_label = type_labels[channel_list.loc[channel, 'Type']]
+    ax1.set_ylabel(y1_label, fontsize=label_size)
+    y_lims, x_lims = get_axis_limits(y_data, x_max)
+    format_and_save_plot(fig, ax1, y_lims, x_lims, y2_label, [], [], file_loc)
+
+def plot_mean_and_band(test_data, group, file_loc):
+    # Plot mean of tests for each channel of group with band from min to max of tests
+    fig = Figure(figsize=(fig_width, fig_height))
+    ax1 = fig.add_subplot()
+    plot_markers = cycle(line_markers)
+    y_data, x_max = [], 0
+
+    for channel_num, channel in enumerate(channel_groups.get_group(group).index.values):
+        times, mean_data, min_data, max_data = get_mean_and_band(test_data, channel)
+
+        # Band keeps rows where either edge peaks
+        band_rows = np.union1d(get_decimated_rows(min_data), get_decimated_rows(max_data))
+        ax1.fill_between(times[band_rows], min_data[band_rows], max_data[band_rows], color=f'C{channel_num}',
+                         alpha=0.3, lw=0)
+        rows = get_decimated_rows(mean_data)
+        ax1.plot(times[rows], mean_data[rows], color=f'C{channel_num}', lw=line_width, marker=next(plot_markers),
+                 markevery=get_marker_spacing(len(mean_data), len(rows)), mew=3, mec='none', ms=7,
+                 label=f"{channel_list.loc[channel, 'Label']} (mean of {len(test_data)})")
+        y_data += [min_data, max_data]
+        x_max = max(x_max, times[-1])
+
+    y1_label, y2_label = type_labels[channel_list.loc[channel, 'Type']]
+    ax1.set_ylabel(y1_label, fontsize=label_size)
+    y_lims, x_lims = get_axis_limits(y_data, x_max)
+    format_and_save_plot(fig, ax1, y_lims, x_lims, y2_label, [], [], file_loc)
+
+# ----------------- #
+# Main Body of Code #
+# ----------------- #
+if __name__ == '__main__':
+    if compare_groups is None:
+        compare_groups = list(channel_groups.groups)
+    compare_channels = channel_list[channel_list['Chart'].isin(compare_groups)]
+
+    # Make sure store has current data for every test
+    update_store(store_dir, get_test_files(data_dir), None, use_data_cache, data_float_dtype)
+    store_index = read_store_index(store_dir)
+
+    for value, tests in get_compare_sets(store_index).items():
+        print(f'--- Comparing {compare_column} = {value}: ' + ', '.join(tests) + ' ---')
+
+        # Convert & filter each test once for all groups being compared
+        test_data = {Test_Name: get_filtered_test_data(Test_Name, compare_channels, store_index) for Test_Name in tests}
+        test_data = {Test_Name: filtered_data for Test_Name, filtered_data in test_data.items() if filtered_data is not None}
+        if len(test_data) < 2:
+            print('  Fewer than 2 tests have data for all channels; skipped')
+            continue
+
+        save_dir = compare_dir / f'{compare_column}_{value}'
+        save_dir.mkdir(parents=True, exist_ok=True)
+
+        # Save stats of each test & summary of stats across tests
+        all_stats, series_stats = get_series_stats({Test_Name: get_channel_stats(filtered_data, compare_channels)
+                                                    for Test_Name, filtered_data in test_data.items()})
+        all_stats.round(3).to_csv(save_dir / 'Series_Stats.csv')
+        series_stats.round(3).to_csv(save_dir / 'Series_Stats_Summary.csv')
+
+        for group in compare_groups:
+            print(f"  Plotting {group.replace('_',' ')}")
+            plot_overlay(test_data, group, save_dir / f'{group}_Overlay.pdf')
+            plot_mean_and_band(test_data, group, save_dir / f'{group}_Mean.pdf')
+
+        print()
@@ -0,0 +1,231 @@
+# data_loading.py
+# ***************************** Run Notes ***************************** #
+# - Functions used to load csv or TDMS files output by v2.3.1.1 of DAQ  #
+#       VI as DataFrames                                                #
+#       + TDMS files are read directly (see tdms_conversion.py),        #
+#           without first being converted to csv                        #
+#       + files named with a timestamp are matched to their test name   #
+#           without being renamed                                       #
+#                                                                       #
+# - Parsed & typed data for each test is cached as a .parquet file next #
+#       to its data file                                                #
+#       + cache is rebuilt whenever size or modification time of the    #
+#           data file no longer match values stored in the cache        #
+#       + only columns that are requested are read from the data file   #
+#           or cache; cache is rebuilt if it's missing any of them      #
+#       + channel columns are read as float_dtype (float32 halves       #
+#           memory use of float64)                                      #
+#       + requires pyarrow; if it isn't installed, data file is parsed  #
+#           every time                                                  #
+# ********************************************************************* #
+
+# --------------- #
+# Import Packages #
+# --------------- #
+import os
+import io
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa, pq = None, None
+
+# ---------------------- #
+# User-Defined Functions #
+# ---------------------- #
+# Columns in csv files that contain text rather than channel data
+text_columns = ['Time', 'Elapsed Time', 'Event']
+
+def get_required_columns(channel_list):
+    # Get data columns needed to plot channels in channel list, including TC paired with each velocity probe
+    columns = ['Time', 'Event'] + list(channel_list.index.values)
+    for channel in channel_list.index[channel_list['Type'] == 'Velocity']:
+        columns.append(channel[0] + 'TC' + channel[3:])
+
+    return(list(dict.fromkeys(columns)))
+
+def read_csv_columns(csv_path):
+    # Read only header of csv file
+    return(list(pd.read_csv(csv_path, skiprows=6, nrows=0).columns))
+
+def read_vi_csv(csv_path, columns=None, float_dtype='float64', skiprows=6):
+    # Read columns of csv file (or buffer) as floats (text columns as str) & replace blank fields with nan
+    if columns is None:
+        columns = read_csv_columns(csv_path)
+    text_cols = [col for col in columns if col in text_columns]
+    col_dtypes = {col: (str if col in text_cols else float_dtype) for col in columns}
+
+    # Leading spaces are skipped so whitespace-only fields are read as nan
+    exp_data = pd.read_csv(csv_path, skiprows=skiprows, usecols=columns, dtype=col_dtypes, skipinitialspace=True)
+    exp_data[text_cols] = exp_data[text_cols].replace(r'^\s*$', np.nan, regex=True)
+
+    return(exp_data)
+
+def read_new_csv_rows(csv_path, file_pos=0, columns=None, float_dtype='float64'):
+    # Read rows appended to csv file since byte offset file_pos; returns (new rows or None, new file_pos)
+    #   + partially written last line is left to be read on next call
+    with open(csv_path, 'rb') as csv_file:
+        info_lines = [csv_file.readline() for line_num in range(7)]
+        if not info_lines[-1].endswith(b'\n'):
+            return(None, file_pos)
+
+        csv_file.seek(max(file_pos, csv_file.tell()))
+        start_pos = csv_file.tell()
+        new_bytes = csv_file.read()
+
+    new_bytes = new_bytes[:new_bytes.rfind(b'\n') + 1]
+    if not new_bytes:
+        return(None, start_pos)
+
+    header = info_lines[-1]
+    if columns is not None:
+        csv_columns = list(pd.read_csv(io.BytesIO(header), nrows=0).columns)
+        columns = [col for col in columns if col in csv_columns]
+
+    new_rows = read_vi_csv(io.BytesIO(header + new_bytes), columns, float_dtype, skiprows=0)
+    return(new_rows, start_pos + len(new_bytes))
+
+def parse_timestamps(timestamps):
+    # Parse DAQ timestamps to datetime64 array; date & time may be separated by ' ', 'T', or '-'
+    timestamps = pd.Series(timestamps)
+    if pd.api.types.is_datetime64_any_dtype(timestamps):
+        return(timestamps.to_numpy(dtype='datetime64[ns]'))
+
+    timestamps = timestamps.astype(str).str.replace(r'^(\d{4}-\d{2}-\d{2})[T-]', r'\1 ', regex=True)
+
+    # Place timestamps without a date on a common date (build_time_base handles their rollovers)
+    no_date = ~timestamps.str.match(r'^\d{4}-\d{2}-\d{2}')
+    timestamps[no_date] = '1970-01-01 ' + timestamps[no_date]
+    return(pd.to_datetime(timestamps, format='ISO8601').to_numpy(dtype='datetime64[ns]'))
+
+def get_sample_timestamps(timestamps):
+    # Parse timestamp of each sample, adding a day each time timestamps without a date wrap back past midnight
+    times = parse_timestamps(timestamps)
+    rollovers = np.cumsum(np.diff(times, prepend=times[:1]) < -np.timedelta64(12, 'h'))
+    return(times + rollovers * np.timedelta64(1, 'D'))
+
+def has_event(events, event):
+    # Check which samples' event labels (nan if sample has none) include event; events sharing a sample are joined
+    #   with '; ' (see tdms_conversion.py)
+    labels = np.asarray(events, dtype=object)
+    is_event = pd.notna(labels)
+    found = np.zeros(len(labels), dtype=bool)
+    found[is_event] = [event in str(label).split('; ') for label in labels[is_event]]
+    return(found)
+
+def build_time_base(timestamps, events, start_event='Ignition'):
+    # Get time (s) of each sample relative to last start_event, keeping fractional seconds
+    times = get_sample_timestamps(timestamps)
+    start_rows = np.flatnonzero(has_event(events, start_event))
+    return((times - times[start_rows[-1]]) / np.timedelta64(1, 's'))
+
+def read_events_file(events_file):
+    # Read events csv in info dir ('Time' (s relative to ignition) &/or 'Timestamp', 'Event' columns)
+    event_df = pd.read_csv(events_file)
+    if 'Time' in event_df.columns:
+        return(event_df[['Time', 'Event']].dropna())
+
+    event_df['Timestamp'] = parse_timestamps(event_df['Timestamp'])
+    return(event_df[['Timestamp', 'Event']].dropna())
+
+def get_event_table(times, timestamps, events, event_sources=(), tolerance=1):
+    # Merge events in data's Event column with other sources into one table of event 'Time' (s) & 'Event'
+    #   + times & timestamps (datetime64) are time base & timestamp of each sample of data
+    #   + each source is a DataFrame of 'Event' & either 'Time' (s relative to ignition) or 'Timestamp'
+    #   + event in a source is dropped if an earlier source has event with same label within tolerance (s)
+    #   + events at the same time are joined with '; ' (as in Event column)
+    is_event = pd.notna(np.asarray(events, dtype=object))
+    event_table = pd.DataFrame({'Time': times[is_event], 'Event': np.asarray(events, dtype=object)[is_event]})
+    event_table = event_table.assign(Event=event_table['Event'].str.split('; ')).explode('Event')
+
+    for source in event_sources:
+        if source.empty:
+            continue
+        if 'Time' in source.columns:
+            source_times = source['Time'].to_numpy(dtype=float)
+        else:
+            # Place timestamped events at sample at or immediately before them (as in tdms_conversion.py)
+            source_timestamps = source['Timestamp'].to_numpy(dtype='datetime64[ns]')
+            rows = np.clip(np.searchsorted(timestamps, source_timestamps, side='right') - 1, 0, None)
+            source_times = times[rows]
+
+        # Drop events already in table
+        source_table = pd.DataFrame({'Time': source_times, 'Event': source['Event'].astype(str).values})
+        matched = [((event_table['Event'] == label) & ((event_table['Time'] - time).abs() <= tolerance)).any()
+                   for time, label in zip(source_table['Time'], source_table['Event'])]
+        event_table = pd.concat([event_table, source_table[~np.array(matched, dtype=bool)]], ignore_index=True)
+
+    event_table = event_table.groupby('Time', sort=True)['Event'].agg('; '.join).reset_index()
+    return(event_table)
+
+def get_source_key(data_path):
+    # Key identifying current version of data file
+    file_stats = os.stat(data_path)
+    return(f'{file_stats.st_size}:{file_stats.st_mtime_ns}')
+
+def read_cache(cache_path, source_key, columns):
+    # Return cached data (None if cache doesn't exist, is stale, or is missing any of columns)
+    if not cache_path.exists():
+        return(None)
+
+    schema = pq.read_schema(cache_path)
+    if (schema.metadata or {}).get(b'source_key', b'').decode() != source_key:
+        return(None)
+
+    if any(col not in schema.names for col in columns):
+        return(None)
+
+    return(pd.read_parquet(cache_path, columns=columns))
+
+def write_cache(exp_data, cache_path, source_key):
+    # Save data as parquet file with key of data file it was parsed from
+    table = pa.Table.from_pandas(exp_data, preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata, b'source_key': source_key.encode()})
+    pq.write_table(table, cache_path)
+
+def get_test_files(data_dir):
+    # Get data file of each test in data_dir, keyed by test name; TDMS file is used if test has csv & TDMS files
+    #   + names of TDMS files end with '_' & 20 character timestamp; csv files may end with '_' & 15 character timestamp
+    test_files = {}
+    for data_path in sorted(data_dir.iterdir()):
+        if data_path.suffix == '.tdms':
+            test_files[data_path.name[:-21]] = data_path
+        elif data_path.suffix == '.csv':
+            Test_Name = data_path.stem
+            if len(data_path.name.split('_')[-1]) == 19 and len(data_path.name[-19:].split('-')) == 4:
+                Test_Name = data_path.name[:-20]
+            test_files.setdefault(Test_Name, data_path)
+
+    return(test_files)
+
+def load_test_data(data_path, columns=None, use_cache=True, float_dtype='float64', cache_path=None):
+    # Load columns of data for test from its cache if current, otherwise parse csv or TDMS file (& update cache)
+    #   + cache is saved next to data file with same name unless cache_path is given
+    if data_path.suffix == '.tdms':
+        # Import here so nptdms is only required when reading TDMS files
+        from tdms_conversion import read_tdms_columns, read_tdms_data
+        file_columns, read_data_file = read_tdms_columns(data_path), read_tdms_data
+    else:
+        file_columns, read_data_file = read_csv_columns(data_path), read_vi_csv
+
+    if columns is None:
+        columns = file_columns
+    columns = [col for col in columns if col in file_columns]
+
+    use_cache = use_cache and pq is not None
+    cache_path = cache_path if cache_path is not None else data_path.with_suffix('.parquet')
+    source_key = f'{get_source_key(data_path)}:{float_dtype}'
+
+    if use_cache:
+        exp_data = read_cache(cache_path, source_key, columns)
+        if exp_data is not None:
+            return(exp_data)
+
+    exp_data = read_data_file(data_path, columns, float_dtype)
+    if use_cache:
+        write_cache(exp_data, cache_path, source_key)
+
+    return(exp_data)
@@ -0,0 +1,213 @@
+# data_processing.py
+# ***************************** Run Notes ***************************** #
+# - Functions used to convert data loaded with data_loading.py from     #
+#       voltages to engineering units based on the channel list         #
+#                                                                       #
+# - Channel list must contain 'Type', 'Scale', 'Offset', & 'Chart'      #
+#       columns & be indexed by channel name                            #
+#       + all channels of a data type are converted together as one     #
+#           2-D array (samples x channels)                              #
+#       + output is a DataFrame of converted data with the same time    #
+#           index as the input data & one column per channel            #
+#                                                                       #
+# - Gas channels are zeroed over the period before their group's lag    #
+#       time, which is read from the column of Test_Description.csv     #
+#       named after the chart group (group name must end with '_Gas')   #
+#       + align_lagged_channels shifts converted gas data back by its   #
+#           group's lag time onto the time base of the other channels;  #
+#           channels sharing a lag time are shifted together & samples  #
+#           are linearly interpolated for lag times between samples     #
+#                                                                       #
+# - Converted data is filtered based on data type (see default_filters) #
+#       + window & order can be set for each channel in the channel     #
+#           list with optional 'Filter_Window' & 'Filter_Order' columns #
+#       + channels sharing the same filter settings are filtered        #
+#           together along the time axis                                #
+#       + Savitzky-Golay filter is applied separately to each run of    #
+#           samples between nan gaps                                    #
+# ********************************************************************* #
+
+# --------------- #
+# Import Packages #
+# --------------- #
+import numpy as np
+import pandas as pd
+from scipy.signal import savgol_filter
+
+# ------------------------- #
+# Define Default Parameters #
+# ------------------------- #
+# Default [filter, window, order] used to filter each data type; order is only used by Savitzky-Golay filter
+default_filters = {'Temperature': ['Moving Average', 5, 0],
+                   'Velocity': ['Savitzky-Golay', 51, 5],
+                   'Differential Pressure': ['Savitzky-Golay', 51, 5],
+                   'Heat Flux': ['Savitzky-Golay', 51, 5],
+                   'Radiant Heat Flux': ['Savitzky-Golay', 51, 5],
+                   'Oxygen': ['Moving Average', 5, 0],
+                   'Carbon Monoxide': ['Moving Average', 5, 0],
+                   'Carbon Dioxide': ['Moving Average', 5, 0]}
+
+# Data types zeroed over the period before their group's lag time (all others are zeroed before ignition)
+gas_types = ['Oxygen', 'Carbon Monoxide', 'Carbon Dioxide']
+
+# ---------------------- #
+# User-Defined Functions #
+# ---------------------- #
+def get_lag_times(channel_list, test_info, Test_Name):
+    # Get lag time of each channel's gas group for test (nan for channels not in a gas group)
+    lag_times = pd.Series(np.nan, index=channel_list.index)
+    gas_charts = channel_list['Chart'].str.endswith('_Gas')
+    lag_times[gas_charts] = [test_info.loc[Test_Name, chart] for chart in channel_list.loc[gas_charts, 'Chart']]
+    return(lag_times)
+
+def interpolate_rows(data, times, new_times):
+    # Linearly interpolate each column of 2-D data (sampled at sorted times) at new_times; nan outside times
+    rows = np.clip(np.searchsorted(times, new_times, side='right') - 1, 0, len(times) - 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weights = ((new_times - times[rows]) / (times[rows + 1] - times[rows]))[:, None]
+        new_data = np.where(weights == 0, data[rows], (1 - weights) * data[rows] + weights * data[rows + 1])
+    new_data[(new_times < times[0]) | (new_times > times[-1])] = np.nan
+    return(new_data)
+
+def align_lagged_channels(converted_data, lag_times):
+    # Shift each channel with a lag time (s) back by that time so its data lines up with channels without one
+    #   + converted_data must be indexed by time (s); samples with no data a lag time later become nan
+    times = converted_data.index.values.astype(float)
+    aligned_data = converted_data.copy()
+    if len(times) < 2:
+        return(aligned_data)
+
+    lag_times = lag_times.reindex(converted_data.columns)
+    for lag_time in np.unique(lag_times.dropna().values):
+        if lag_time == 0:
+            continue
+        channels = list(lag_times.index[lag_times == lag_time])
+        aligned_data[channels] = interpolate_rows(converted_data[channels].to_numpy(dtype=float), times,
+                                                  times + lag_time)
+
+    return(aligned_data)
+
+def get_baselines(data, times, end_times):
+    # Mean of each column of data over samples with times <= that column's end time (nans ignored)
+    baselines = np.full(data.shape[1], np.nan)
+    for end_time in np.unique(end_times[~np.isnan(end_times)]):
+        cols = end_times == end_time
+        baseline_data = data[times <= end_time][:, cols]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            baselines[cols] = np.nansum(baseline_data, axis=0) / np.sum(~np.isnan(baseline_data), axis=0)
+
+    return(baselines)
+
+def get_baseline_end_times(channel_list, lag_times=None):
+    # Get time (s) that ends period used to zero each channel (-1 s, or 1 s before lag time for gas channels)
+    end_times = pd.Series(-1., index=channel_list.index)
+    is_gas = channel_list['Type'].isin(gas_types)
+    if is_gas.any():
+        if lag_times is None:
+            raise ValueError('Lag times are required to convert gas data')
+        end_times[is_gas] = lag_times[is_gas] - 1
+
+    return(end_times)
+
+def convert_channel_data(exp_data, channel_list, lag_times=None, baselines=None):
+    # Convert data for every channel in channel_list, one data type at a time; exp_data must be indexed by time (s)
+    #   + baselines (mean raw value of each channel used to zero data) are computed from exp_data if not given
+    times = exp_data.index.values.astype(float)
+    if baselines is None:
+        end_times = get_baseline_end_times(channel_list, lag_times)
+    converted = {}
+
+    for data_type, type_channels in channel_list.groupby('Type'):
+        channels = list(type_channels.index.values)
+        data = exp_data[channels].to_numpy(dtype=float)
+        scale_factors = type_channels['Scale'].to_numpy(dtype=float)
+        offsets = type_channels['Offset'].to_numpy(dtype=float)
+
+        if data_type == 'Temperature':
+            converted.update(zip(channels, data.T))
+            continue
+
+        if baselines is None:
+            raw_baselines = get_baselines(data, times, end_times[channels].to_numpy(dtype=float))
+        else:
+            raw_baselines = baselines[channels].to_numpy(dtype=float)
+
+        if data_type == 'Velocity':
+            zeroed_data = data - raw_baselines
+            tc_data = exp_data[[channel[0] + 'TC' + channel[3:] for channel in channels]].to_numpy(dtype=float)
+            converted_data = np.sign(zeroed_data) * 0.0698 * np.sqrt((tc_data + 273.15) * (scale_factors * np.abs(zeroed_data)))
+
+        elif data_type == 'Differential Pressure':
+            # Zeroing raw data is the same as zeroing data after applying scale & offset
+            converted_data = scale_factors * (data - raw_baselines)
+
+        elif data_type == 'Heat Flux' or data_type == 'Radiant Heat Flux':
+            zeroed_data = data - raw_baselines
+            converted_data = zeroed_data * scale_factors
+
+        elif data_type in gas_types:
+            if data_type == 'Oxygen':
+                # Use next line for O2 ranging from 0-5 V (scale_factor = 5 in channel list)
+                # zeroed_data = data - (raw_baselines - 5. * (20.98 / 25))
+                # Use next line for O2 ranging from 1-5 V (scale_factor = 6.25 in channel list)
+                zeroed_data = data - (raw_baselines - 4. * (20.98 / 25) - 1) - 1
+            else:
+                zeroed_data = data - raw_baselines
+            converted_data = scale_factors * zeroed_data + offsets
+
+        else:
+            raise ValueError(f"Data type for {', '.join(channels)} not found!")
+
+        converted.update(zip(channels, converted_data.T))
+
+    return(pd.DataFrame(converted, index=exp_data.index)[list(channel_list.index)])
+
+def savgol_filter_segments(data, window, order):
+    # Apply Savitzky-Golay filter along axis 0 of 2-D data, filtering each run of non-nan rows separately
+    filtered_data = np.full(data.shape, np.nan)
+
+    # Columns with the same pattern of nans share runs, so they're filtered together
+    patterns, pattern_idx = np.unique(~np.isnan(data), axis=1, return_inverse=True)
+    pattern_idx = pattern_idx.ravel()
+    for pattern_num in range(patterns.shape[1]):
+        cols = pattern_idx == pattern_num
+        run_edges = np.diff(np.concatenate([[0], patterns[:, pattern_num].astype(int), [0]]))
+
+        for start, end in zip(np.flatnonzero(run_edges == 1), np.flatnonzero(run_edges == -1)):
+            # Shrink window to largest odd length that fits in run; leave runs too short to filter as is
+            run_window = min(window, end - start - (1 - (end - start) % 2))
+            if run_window <= order:
+                filtered_data[start:end, cols] = data[start:end, cols]
+            else:
+                filtered_data[start:end, cols] = savgol_filter(data[start:end, cols], run_window, order, axis=0)
+
+    return(filtered_data)
+
+def get_filter_settings(channel_list):
+    # Get filter, window, & order for each channel based on its data type & optional channel list columns
+    settings = pd.DataFrame([default_filters[data_type] for data_type in channel_list['Type']],
+                            index=channel_list.index, columns=['Filter', 'Window', 'Order'])
+    for column, setting in [['Filter_Window', 'Window'], ['Filter_Order', 'Order']]:
+        if column in channel_list.columns:
+            settings[setting] = channel_list[column].fillna(settings[setting]).astype(int)
+
+    return(settings)
+
+def filter_channel_data(converted_data, channel_list, start_time=0):
+    # Filter converted data for every channel in channel_list, one batch per filter setting
+    #   + only data from start_time on is returned (& Savitzky-Golay filtered); None returns all data
+    settings = get_filter_settings(channel_list)
+    post_ignition = converted_data.index.values >= (start_time if start_time is not None else -np.inf)
+    filtered = {}
+
+    for (filter_type, window, order), batch in settings.groupby(['Filter', 'Window', 'Order']):
+        channels = list(batch.index.values)
+        if filter_type == 'Moving Average':
+            batch_data = converted_data[channels].rolling(window=window, center=True).mean()
+            batch_data = batch_data.to_numpy(dtype=float)[post_ignition]
+        else:
+            batch_data = savgol_filter_segments(converted_data[channels].to_numpy(dtype=float)[post_ignition], window, order)
+
+        filtered.update(zip(channels, batch_data.T))
+
+    return(pd.DataFrame(filtered, index=converted_data.index[post_ignition])[list(channel_list.index)])
@@ -0,0 +1,95 @@
+# data_statistics.py
+# ***************************** Run Notes ***************************** #
+# - Functions used to summarize data converted & filtered with          #
+#       data_processing.py                                              #
+#       + max, min, mean, & time to peak of every channel               #
+#       + time each channel spends past the thresholds set for its data #
+#           type (see type_thresholds)                                  #
+#       + integral over time for data types in integral_types (e.g.     #
+#           heat flux dose)                                             #
+#                                                                       #
+# - All channels are summarized together as one 2-D array (samples x    #
+#       channels), so time doesn't grow with per-channel Python work    #
+#       + nan samples are ignored; intervals touching a nan sample are  #
+#           left out of time past thresholds & integrals                #
+#       + time past a threshold counts each interval between samples    #
+#           that starts at a sample past the threshold                  #
+#                                                                       #
+# - Summaries of several tests are combined into one table per series   #
+#       with get_series_stats                                           #
+# ********************************************************************* #
+
+# --------------- #
+# Import Packages #
+# --------------- #
+import numpy as np
+import pandas as pd
+
+# ------------------------- #
+# Define Default Parameters #
+# ------------------------- #
+# [comparison, threshold] pairs; time (s) each channel of a data type spends past each threshold is reported
+type_thresholds = {'Temperature': [['>', 260]],
+                   'Oxygen': [['<', 15]]}
+
+# Name of integral over time reported for each data type
+integral_types = {'Heat Flux': 'Dose (kJ/m2)',
+                  'Radiant Heat Flux': 'Dose (kJ/m2)'}
+
+# ---------------------- #
+# User-Defined Functions #
+# ---------------------- #
+def get_threshold_label(comparison, threshold):
+    # Column name for time past threshold
+    return(f"Time {'Above' if comparison == '>' else 'Below'} {threshold} (s)")
+
+def get_channel_stats(filtered_data, channel_list):
+    # Summarize every channel in channel_list; filtered_data must be indexed by time (s)
+    channels = list(channel_list.index.values)
+    times = filtered_data.index.values.astype(float)
+    data = filtered_data[channels].to_numpy(dtype=float)
+    has_data = ~np.isnan(data).all(axis=0)
+
+    stats = pd.DataFrame(index=pd.Index(channels, name='Channel'))
+    stats['Type'] = channel_list['Type'].values
+    with np.errstate(invalid='ignore'):
+        stats['Max'] = np.max(data, axis=0, initial=-np.inf, where=~np.isnan(data))
+        stats['Min'] = np.min(data, axis=0, initial=np.inf, where=~np.isnan(data))
+        stats['Mean'] = np.nansum(data, axis=0) / np.sum(~np.isnan(data), axis=0)
+    peak_rows = np.argmax(np.where(np.isnan(data), -np.inf, data), axis=0)
+    stats['Time to Peak (s)'] = times[peak_rows]
+
+    # Length of interval following each sample; intervals ending at a nan sample are dropped below
+    intervals = np.diff(times)[:, None]
+    next_valid = ~np.isnan(data[1:])
+
+    for data_type, thresholds in type_thresholds.items():
+        cols = (stats['Type'] == data_type).values
+        if not cols.any():
+            continue
+        for comparison, threshold in thresholds:
+            with np.errstate(invalid='ignore'):
+                past = data[:-1, cols] > threshold if comparison == '>' else data[:-1, cols] < threshold
+            stats.loc[cols, get_threshold_label(comparison, threshold)] = \
+                np.sum(intervals * (past & next_valid[:, cols]), axis=0)
+
+    for data_type, label in integral_types.items():
+        cols = (stats['Type'] == data_type).values
+        if cols.any():
+            # Trapezoidal rule, skipping intervals with a nan sample at either end
+            areas = intervals * (data[:-1, cols] + data[1:, cols]) / 2
+            stats.loc[cols, label] = np.nansum(areas, axis=0)
+
+    # Channels without any data have no stats
+    stats.loc[~has_data, stats.columns != 'Type'] = np.nan
+
+    return(stats)
+
+def get_series_stats(test_stats):
+    # Combine summaries of several tests (dict keyed by test name); returns (stats of every test, stats across tests)
+    #   + stats across tests are the mean, std, min, & max of each statistic for each channel
+    all_stats = pd.concat(test_stats, names=['Test'])
+    stat_columns = [col for col in all_stats.columns if col != 'Type']
+    series_stats = all_stats.groupby(level='Channel', sort=False)[stat_columns].agg(['mean', 'std', 'min', 'max'])
+
+    return(all_stats, series_stats)
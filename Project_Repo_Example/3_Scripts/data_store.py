@@ -0,0 +1,130 @@
+# data_store.py
+# ***************************** Run Notes ***************************** #
+# - Functions used to save data for a series of tests to an on-disk     #
+#       store & read channels across many tests without loading the     #
+#       rest of each test's data                                        #
+#                                                                       #
+# - Each test is saved to its own directory in store_dir with one .npy  #
+#       file per channel, plus 'Time.npy' (time (s) relative to         #
+#       ignition)                                                       #
+#       + arrays are opened memory-mapped, so only the samples that are #
+#           sliced are read from disk                                   #
+#                                                                       #
+# - store_index.json in store_dir lists the tests in the store & the    #
+#       channels, number of samples, time range, & events of each test  #
+#       + test is saved again only if its data file (csv or TDMS)       #
+#           changed (data file is identified the same way as for data   #
+#           cache in data_loading.py)                                   #
+#       + tests without an 'Ignition' event are not saved               #
+# ********************************************************************* #
+
+# --------------- #
+# Import Packages #
+# --------------- #
+import json
+import numpy as np
+import pandas as pd
+from data_loading import build_time_base, get_source_key, has_event, load_test_data, text_columns
+
+# ---------------------- #
+# User-Defined Functions #
+# ---------------------- #
+def read_store_index(store_dir):
+    # Return index of tests in store (empty if store doesn't exist yet)
+    index_file = store_dir / 'store_index.json'
+    if not index_file.exists():
+        return({})
+
+    with open(index_file) as store_index:
+        return(json.load(store_index))
+
+def write_store_index(store_dir, store_index):
+    # Save index of tests in store
+    with open(store_dir / 'store_index.json', 'w') as index_file:
+        json.dump(store_index, index_file, indent=4, sort_keys=True)
+
+def save_test_to_store(store_dir, store_index, Test_Name, exp_data, source_key):
+    # Save each channel of exp_data (indexed by time, with 'Event' column) as .npy file & add test to store index
+    test_dir = store_dir / Test_Name
+    test_dir.mkdir(parents=True, exist_ok=True)
+
+    channels = [col for col in exp_data.columns if col not in text_columns]
+    np.save(test_dir / 'Time.npy', exp_data.index.to_numpy(dtype=float))
+    for channel in channels:
+        np.save(test_dir / f'{channel}.npy', exp_data[channel].to_numpy())
+
+    # Events are stored in index as the row & label of each event
+    event_rows = np.flatnonzero(pd.notna(exp_data['Event']).to_numpy())
+    store_index[Test_Name] = {'source_key': source_key, 'channels': channels, 'num_rows': len(exp_data),
+                              'time_range': [float(exp_data.index[0]), float(exp_data.index[-1])],
+                              'event_rows': event_rows.tolist(),
+                              'event_labels': exp_data['Event'].iloc[event_rows].tolist()}
+
+def update_store(store_dir, test_files, columns=None, use_cache=True, float_dtype='float64'):
+    # Save tests whose data files are new or changed since they were last saved; returns names of tests saved
+    #   + test_files is dict of data file (csv or TDMS) of each test, keyed by test name (see get_test_files)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    store_index = read_store_index(store_dir)
+    saved_tests = []
+
+    for Test_Name, data_path in test_files.items():
+        source_key = f'{get_source_key(data_path)}:{float_dtype}'
+        if store_index.get(Test_Name, {}).get('source_key') == source_key:
+            continue
+
+        exp_data = load_test_data(data_path, columns, use_cache, float_dtype,
+                                  data_path.parent / f'{Test_Name}.parquet')
+        if not has_event(exp_data['Event'], 'Ignition').any():
+            print(f'--- {Test_Name} not saved to data store (no Ignition event) ---')
+            continue
+
+        exp_data.index = build_time_base(exp_data['Time'], exp_data['Event'], 'Ignition')
+        save_test_to_store(store_dir, store_index, Test_Name, exp_data.drop(columns='Time'), source_key)
+
+        # Index is saved after each test so finished tests are kept if a later test fails
+        write_store_index(store_dir, store_index)
+        saved_tests.append(Test_Name)
+        print(f'--- Saved {Test_Name} to data store ---')
+
+    return(saved_tests)
+
+def open_store_array(store_dir, Test_Name, channel):
+    # Open channel (or 'Time') array of test memory-mapped; data is read from disk only when sliced
+    return(np.load(store_dir / Test_Name / f'{channel}.npy', mmap_mode='r'))
+
+def get_time_slice(times, start_time=None, end_time=None):
+    # Get slice of rows with start_time <= time <= end_time (times must be sorted)
+    start_row = 0 if start_time is None else np.searchsorted(times, start_time, side='left')
+    end_row = len(times) if end_time is None else np.searchsorted(times, end_time, side='right')
+    return(slice(start_row, end_row))
+
+def load_test_channel(store_dir, Test_Name, channel, start_time=None, end_time=None):
+    # Load channel of test from start_time to end_time (s) as Series indexed by time
+    times = open_store_array(store_dir, Test_Name, 'Time')
+    rows = get_time_slice(times, start_time, end_time)
+    return(pd.Series(np.array(open_store_array(store_dir, Test_Name, channel)[rows]),
+                     index=pd.Index(np.array(times[rows]), name='Time'), name=channel))
+
+def load_series_channel(store_dir, channel, tests=None, start_time=None, end_time=None):
+    # Load channel from start_time to end_time (s) for each test in tests (all tests in store if None) that has it
+    #   + returns dict of Series indexed by time, keyed by test name
+    store_index = read_store_index(store_dir)
+    if tests is None:
+        tests = list(store_index)
+
+    return({Test_Name: load_test_channel(store_dir, Test_Name, channel, start_time, end_time)
+            for Test_Name in tests if channel in store_index.get(Test_Name, {}).get('channels', [])})
+
+def load_test_from_store(store_dir, Test_Name, channels=None):
+    # Load channels of test (all channels if None) as DataFrame indexed by time, with 'Event' column
+    test_index = read_store_index(store_dir)[Test_Name]
+    if channels is None:
+        channels = test_index['channels']
+
+    exp_data = pd.DataFrame({channel: open_store_array(store_dir, Test_Name, channel) for channel in channels},
+                            index=pd.Index(np.array(open_store_array(store_dir, Test_Name, 'Time')), name='Time'))
+    events = np.full(len(exp_data), np.nan, dtype=object)
+    events[test_index['event_rows']] = test_index['event_labels']
+    exp_data['Event'] = events
+
+    return(exp_data)
@@ -0,0 +1,135 @@
+# data_uncertainty.py
+# ***************************** Run Notes ***************************** #
+# - Functions used to estimate uncertainty bands of data converted with #
+#       data_processing.py by Monte Carlo sampling                      #
+#       + expanded (95 %) relative uncertainty of each input to the     #
+#           conversion of each data type is set in type_uncertainties   #
+#           (defaults follow Measurement Uncertainty section of         #
+#           Report_Template/FSRI_Report.tex)                            #
+#       + errors of inputs are drawn from normal distributions with     #
+#           standard deviation of expanded uncertainty divided by       #
+#           coverage_factor                                             #
+#                                                                       #
+# - Systematic (Type B) errors are drawn once per draw & channel & are  #
+#       propagated through the conversion of each data type             #
+#       + scale factors of heat flux & pressure, readings of            #
+#           temperature & gas concentration, & scale factor, paired TC  #
+#           temperature, & probe coefficient of velocity (BDP formula)  #
+#       + if standard deviation of each channel's samples is given      #
+#           (e.g. before ignition, see get_type_A_sigmas), random (Type #
+#           A) error is also drawn for every sample                     #
+#                                                                       #
+# - Draws are evaluated as one (draws x rows x channels) array for a    #
+#       block of rows at a time; rows per block are set so each array   #
+#       has at most max_block_values values, which bounds memory use    #
+#       for tests of any length                                         #
+#       + band is the central coverage (95 %) interval of draws at each #
+#           row                                                         #
+#       + errors of each channel are drawn from generators seeded by    #
+#           seed & the channel's name (one for systematic & one for     #
+#           random errors), so bands are repeatable & channels don't    #
+#           share draws                                                 #
+# ********************************************************************* #
+
+# --------------- #
+# Import Packages #
+# --------------- #
+import zlib
+import numpy as np
+import pandas as pd
+
+# ------------------------- #
+# Define Default Parameters #
+# ------------------------- #
+# Expanded relative uncertainty of each input to conversion of each data type
+#   + 'Reading': converted value; 'Scale': scale factor; 'Temperature': temperature (C) of TC paired with velocity
+#       probe; 'Coefficient': velocity probe coefficient
+type_uncertainties = {'Temperature': {'Reading': 0.15},
+                      'Velocity': {'Scale': 0.10, 'Temperature': 0.15, 'Coefficient': 0.16},
+                      'Differential Pressure': {'Scale': 0.10},
+                      'Heat Flux': {'Scale': 0.08},
+                      'Radiant Heat Flux': {'Scale': 0.08},
+                      'Oxygen': {'Reading': 0.12},
+                      'Carbon Monoxide': {'Reading': 0.12},
+                      'Carbon Dioxide': {'Reading': 0.12}}
+
+# Coverage factor of expanded uncertainties (2 for 95 % confidence interval)
+coverage_factor = 2
+
+# Inputs that can have uncertainty
+uncertainty_inputs = ['Reading', 'Scale', 'Temperature', 'Coefficient']
+
+# ---------------------- #
+# User-Defined Functions #
+# ---------------------- #
+def get_type_A_sigmas(converted_data, end_time=0):
+    # Standard deviation of each channel over samples before end_time (s); converted_data must be indexed by time
+    times = converted_data.index.values.astype(float)
+    return(converted_data[times < end_time].std())
+
+def get_channel_rng(seed, channel, stream=0):
+    # Random generator for channel seeded by seed & channel's name; stream 0 is systematic errors, 1 is random errors
+    return(np.random.default_rng([seed, zlib.crc32(str(channel).encode()), stream]))
+
+def get_input_factors(channel_list, num_draws, seed=0):
+    # Draw factors (1 + relative error) of each input of each channel; returns dict of (draws x channels) arrays
+    factors = {name: np.ones((num_draws, len(channel_list))) for name in uncertainty_inputs}
+    for col, (channel, data_type) in enumerate(channel_list['Type'].items()):
+        rng = get_channel_rng(seed, channel)
+        for name, expanded in type_uncertainties.get(data_type, {}).items():
+            factors[name][:, col] += rng.normal(0, expanded / coverage_factor, num_draws)
+
+    return(factors)
+
+def propagate_draws(data, tc_data, factors, is_velocity):
+    # Evaluate conversion of each draw for 2-D data (rows x channels); returns (draws x rows x channels) array
+    #   + heat flux, pressure, & gas data scale linearly with scale factor & reading
+    draws = data[None] * (factors['Reading'] * factors['Scale'])[:, None]
+
+    # Velocity scales with probe coefficient & square root of scale factor & absolute temperature of paired TC
+    if is_velocity.any():
+        tc_temps = tc_data[:, is_velocity][None]
+        temp_ratio = (tc_temps * factors['Temperature'][:, None, is_velocity] + 273.15) / (tc_temps + 273.15)
+        draws[:, :, is_velocity] = data[:, is_velocity][None] * factors['Coefficient'][:, None, is_velocity] * \
+            np.sqrt(factors['Scale'][:, None, is_velocity] * temp_ratio)
+
+    return(draws)
+
+def get_uncertainty_bands(data, channel_list, exp_data=None, num_draws=500, type_A_sigmas=None, seed=0,
+                          coverage=0.95, max_block_values=10**7):
+    # Get (lower, upper) edges of coverage band of each channel in channel_list as DataFrames shaped like data
+    #   + data is converted (or filtered) data; exp_data (raw data with TC paired with each velocity probe) must
+    #       have the same rows as data & is only needed for velocity channels
+    #   + channels with a data type not in type_uncertainties have nan bands
+    channels = list(channel_list.index.values)
+    values = data[channels].to_numpy(dtype=float)
+    is_velocity = (channel_list['Type'] == 'Velocity').to_numpy()
+    tc_data = np.full(values.shape, np.nan)
+    if exp_data is not None and is_velocity.any():
+        tc_channels = [channel[0] + 'TC' + channel[3:] for channel in channel_list.index[is_velocity]]
+        tc_data[:, is_velocity] = exp_data[tc_channels].to_numpy(dtype=float)
+    elif is_velocity.any():
+        # Without paired TC data, temperature of velocity probes is treated as exact
+        tc_data[:, is_velocity] = 0
+
+    factors = get_input_factors(channel_list, num_draws, seed)
+    sigmas = np.zeros(len(channels)) if type_A_sigmas is None else \
+        type_A_sigmas.reindex(channels).fillna(0).to_numpy(dtype=float)
+    noise_rngs = [get_channel_rng(seed, channel, 1) for channel in channels]
+    quantiles = [(1 - coverage) / 2, (1 + coverage) / 2]
+
+    bands = np.full((2,) + values.shape, np.nan)
+    block_rows = max(1, max_block_values // (num_draws * max(1, len(channels))))
+    for start_row in range(0, len(values), block_rows):
+        rows = slice(start_row, start_row + block_rows)
+        draws = propagate_draws(values[rows], tc_data[rows], factors, is_velocity)
+        for col in np.flatnonzero(sigmas):
+            draws[:, :, col] += noise_rngs[col].standard_normal(draws.shape[:2]) * sigmas[col]
+        bands[:, rows] = np.quantile(draws, quantiles, axis=0)
+
+    # Channels without uncertainties have no band
+    no_band = ~channel_list['Type'].isin(list(type_uncertainties)).to_numpy()
+    bands[:, :, no_band] = np.nan
+
+    return(pd.DataFrame(bands[0], index=data.index, columns=channels),
+           pd.DataFrame(bands[1], index=data.index, columns=channels))
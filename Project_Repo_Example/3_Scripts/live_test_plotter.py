@@ -0,0 +1,198 @@
+# live_test_plotter.py
+# ***************************** Run Notes ***************************** #
+# - Script used to plot data while a test is running from the csv or    #
+#       TDMS file being written by v2.3.1.1 of DAQ VI                   #
+#       + set data_file to the file in the DAQ output directory (file   #
+#           doesn't need to be copied to data_dir)                      #
+#                                                                       #
+# - Every refresh_interval seconds, only rows appended to the file      #
+#       since the last refresh are read, converted, & filtered          #
+#       + last rows of each update are carried over so filter windows   #
+#           span updates; the last half window of rows is plotted once  #
+#           the next rows arrive                                        #
+#       + charts show the last display_window seconds of data, so work  #
+#           per refresh doesn't grow with the length of the test        #
+#                                                                       #
+# - Channel list, test description, & plot parameters are imported      #
+#       from post_test_plotter_new_VI.py                                #
+#       + time is relative to the first sample until the 'Ignition'     #
+#           event is logged & relative to ignition after that           #
+#       + channels are zeroed using all samples before ignition (&      #
+#           before lag time for gas channels); until ignition is        #
+#           logged, all samples so far are used                         #
+#                                                                       #
+# - Close all chart windows to stop the script                          #
+# ********************************************************************* #
+
+# --------------- #
+# Import Packages #
+# --------------- #
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from itertools import cycle
+from data_loading import get_required_columns, has_event, parse_timestamps, read_new_csv_rows
+from data_processing import convert_channel_data, filter_channel_data, get_baseline_end_times, \
+    get_filter_settings, get_lag_times
+from post_test_plotter_new_VI import channel_list, channel_groups, data_dir, test_info, type_labels, \
+    line_markers, line_width, label_size, tick_size, event_font, font_rotation, legend_font, \
+    fig_width, fig_height, data_float_dtype
+
+# ------------------- #
+# Set Live Parameters #
+# ------------------- #
+# Name of test & file being written by DAQ VI (.csv or .tdms)
+Test_Name = 'Test_Name'
+data_file = data_dir / f'{Test_Name}.csv'
+
+# Chart groups to display; set to None to display every group in channel list
+live_groups = None
+
+refresh_interval = 5    # time (s) between chart updates
+display_window = 1800   # time (s) of most recent data shown on charts
+
+# ---------------------- #
+# User-Defined Functions #
+# ---------------------- #
+def read_new_rows(read_pos):
+    # Read rows appended to data_file since read_pos (byte offset for csv, row number for TDMS)
+    if data_file.suffix == '.tdms':
+        # Import here so nptdms is only required when following TDMS files
+        from tdms_conversion import read_new_tdms_rows
+        return(read_new_tdms_rows(data_file, read_pos))
+
+    return(read_new_csv_rows(data_file, read_pos, get_required_columns(live_channels), data_float_dtype))
+
+def update_live_data(live_data, new_rows):
+    # Convert & filter rows appended to data file; keep only data within display_window of latest sample
+    new_times = parse_timestamps(new_rows['Time'])
+    if live_data['first_time'] is None:
+        live_data['first_time'] = new_times[0]
+
+    # Use last ignition event as start of test once it has been logged
+    events = new_rows['Event'].to_numpy(dtype=object)
+    is_event = pd.notna(events)
+    is_ignition = has_event(events, 'Ignition')
+    if is_ignition.any():
+        live_data['ignition_time'] = new_times[is_ignition][-1]
+    live_data['event_times'] = np.concatenate([live_data['event_times'], new_times[is_event]])
+    live_data['event_labels'] = np.concatenate([live_data['event_labels'], events[is_event]])
+
+    # Add new rows to running sums used to get baselines (all rows are used until ignition is logged)
+    raw_data = new_rows[raw_channels].to_numpy(dtype=float)
+    if live_data['ignition_time'] is None:
+        in_baseline = np.ones(raw_data.shape, dtype=bool)
+    else:
+        rel_times = (new_times - live_data['ignition_time']) / np.timedelta64(1, 's')
+        in_baseline = rel_times[:, None] <= baseline_end_times[None, :]
+    in_baseline &= ~np.isnan(raw_data)
+    live_data['baseline_sums'] += np.where(in_baseline, raw_data, 0).sum(axis=0)
+    live_data['baseline_counts'] += in_baseline.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        baselines = pd.Series(live_data['baseline_sums'] / live_data['baseline_counts'], index=raw_channels)
+
+    # Convert & filter new rows together with rows carried over from last update
+    rows = pd.concat([live_data['carry_rows'], new_rows[raw_channels]], ignore_index=True)
+    times = np.concatenate([live_data['carry_times'], new_times])
+    rows.index = (times - live_data['first_time']) / np.timedelta64(1, 's')
+    converted_data = convert_channel_data(rows, live_channels, lag_times, baselines)
+    filtered_data = filter_channel_data(converted_data, live_channels, start_time=None)
+
+    # Keep rows with complete filter windows; carry last rows over to be filtered again next update
+    done_rows = slice(half_window, len(rows) - half_window)
+    live_data['times'] = np.concatenate([live_data['times'], times[done_rows]])
+    live_data['values'] = np.concatenate([live_data['values'], filtered_data.to_numpy()[done_rows]])
+    if len(rows) > 2 * half_window:
+        live_data['carry_rows'] = rows.iloc[len(rows) - 2 * half_window:].reset_index(drop=True)
+        live_data['carry_times'] = times[len(rows) - 2 * half_window:]
+    else:
+        live_data['carry_rows'] = rows.reset_index(drop=True)
+        live_data['carry_times'] = times
+
+    # Drop data that's no longer displayed
+    in_window = live_data['times'] >= times[-1] - np.timedelta64(int(display_window * 1000), 'ms')
+    live_data['times'] = live_data['times'][in_window]
+    live_data['values'] = live_data['values'][in_window]
+
+def create_live_figure(group):
+    # Create figure with an empty line for each channel in group
+    fig, ax1 = plt.subplots(figsize=(fig_width, fig_height))
+    fig.canvas.manager.set_window_title(group.replace('_', ' '))
+    plot_markers = cycle(line_markers)
+
+    group_lines = {}
+    for channel in channel_groups.get_group(group).index.values:
+        group_lines[channel] = ax1.plot([], [], lw=line_width, marker=next(plot_markers), markevery=60, mew=3,
+                                        mec='none', ms=7, label=channel_list.loc[channel, 'Label'])[0]
+
+    ax1.tick_params(labelsize=tick_size, length=0, width=0)
+    ax1.set_xlabel('Time (s)', fontsize=label_size)
+    ax1.set_ylabel(type_labels[channel_list.loc[channel, 'Type']][0], fontsize=label_size)
+    ax1.legend(loc='upper left', fontsize=legend_font, handlelength=3, frameon=True, framealpha=0.75)
+    fig.tight_layout(rect=[0, 0, 1, 0.9])
+
+    return({'fig': fig, 'ax1': ax1, 'lines': group_lines, 'event_artists': []})
+
+def update_live_figure(live_figure, live_data):
+    # Update lines & event labels in figure with data currently in display window
+    start_time = live_data['ignition_time'] if live_data['ignition_time'] is not None else live_data['first_time']
+    x_data = (live_data['times'] - start_time) / np.timedelta64(1, 's')
+    ax1 = live_figure['ax1']
+
+    for channel, line in live_figure['lines'].items():
+        line.set_data(x_data, live_data['values'][:, live_channels.index.get_loc(channel)])
+
+    # Redraw event lines & labels within display window
+    [artist.remove() for artist in live_figure['event_artists']]
+    live_figure['event_artists'] = []
+    event_x = (live_data['event_times'] - start_time) / np.timedelta64(1, 's')
+    for _x, label in zip(event_x, live_data['event_labels']):
+        if len(x_data) and _x >= x_data[0]:
+            live_figure['event_artists'].append(ax1.axvline(_x, color='0.25', lw=1))
+            live_figure['event_artists'].append(ax1.text(_x, 1.01, label, transform=ax1.get_xaxis_transform(),
+                                                         rotation=font_rotation, fontsize=event_font, ha='left'))
+
+    ax1.relim()
+    ax1.autoscale_view()
+    live_figure['fig'].canvas.draw_idle()
+
+# ----------------- #
+# Main Body of Code #
+# ----------------- #
+if __name__ == '__main__':
+    if live_groups is None:
+        live_groups = list(channel_groups.groups)
+
+    # Get channels displayed, raw data columns they require, & baseline periods used to zero them
+    live_channels = channel_list[channel_list['Chart'].isin(live_groups)]
+    raw_channels = [col for col in get_required_columns(live_channels) if col not in ['Time', 'Event']]
+    if Test_Name in test_info.index:
+        lag_times = get_lag_times(live_channels, test_info, Test_Name)
+    else:
+        print(f'{Test_Name} not found in Test_Description.csv; gas channels will be zeroed using lag time of 0 s')
+        lag_times = pd.Series(0., index=live_channels.index)
+    baseline_end_times = get_baseline_end_times(live_channels, lag_times).reindex(raw_channels).fillna(-1).values
+
+    # Rows carried between updates must span largest filter window
+    half_window = int(get_filter_settings(live_channels)['Window'].max()) // 2
+
+    live_data = {'first_time': None, 'ignition_time': None,
+                 'baseline_sums': np.zeros(len(raw_channels)), 'baseline_counts': np.zeros(len(raw_channels)),
+                 'carry_rows': pd.DataFrame(columns=raw_channels, dtype=float),
+                 'carry_times': np.array([], dtype='datetime64[ns]'),
+                 'times': np.array([], dtype='datetime64[ns]'), 'values': np.empty((0, len(live_channels))),
+                 'event_times': np.array([], dtype='datetime64[ns]'), 'event_labels': np.array([], dtype=object)}
+
+    plt.ion()
+    live_figures = {group: create_live_figure(group) for group in live_groups}
+
+    print(f'--- Following {data_file.name} (close chart windows to stop) ---')
+    read_pos = 0
+    while plt.get_fignums():
+        new_rows, read_pos = read_new_rows(read_pos)
+        if new_rows is not None and len(new_rows) > 0:
+            update_live_data(live_data, new_rows)
+            [update_live_figure(live_figure, live_data) for live_figure in live_figures.values()]
+            print(f'  {len(new_rows)} new rows read; {len(live_data["times"])} rows displayed')
+
+        plt.pause(refresh_interval)
@@ -6,39 +6,108 @@
 #                                                                       #
 # - If plot_all = True, plots will be generated for all data files      #
 #       present in data_dir                                             #
+#       + if plot_all = False, only charts whose inputs (data file,     #
+#           channel list rows for chart group, row of test description, #
+#           plot parameters, & filter, dtype, & stats settings) changed #
+#           since the last run are regenerated; inputs used for each    #
+#           chart are tracked in chart_manifest.json in plot_dir        #
 #                                                                       #
 # - Script assumes csv or TDMS data file has been copied from DAQ       #
 #       output directory to repo dir defined as data_dir                #
-#       + if TDMS file is found, file will be converted to csv          #
-#       + if csv file is found, timestamp will be removed from file's   #
-#           name                                                        #
+#       + TDMS files are read directly (used instead of csv file if     #
+#           test has both); files are matched to their test name        #
+#           without being renamed (see get_test_files)                  #
+#       + if export_csv = True, csv file is also written for each TDMS  #
+#           file without one, in a background process while tests are   #
+#           plotted                                                     #
 #                                                                       #
 # - Script is written to get gas lag times from file in info_dir named  #
 #       "Test_Description.csv" that contains columns for each gas group #
 #       with inputs corresponding to lag times                          #
+#       + if align_gas_data = True, gas data is shifted back by its     #
+#           group's lag time so it lines up with the other channels     #
+#           before it's filtered & plotted                              #
+#                                                                       #
+# - Events are collected once per test into one table used by every     #
+#       chart: events in data file's 'Event' column, then events in     #
+#       <Test_Name>_Events.csv in events_dir, then events in 'Events'   #
+#       group of TDMS file (if still in data_dir)                       #
+#       + event repeated in a later source (same label within 1 s) is   #
+#           only shown once                                             #
+#                                                                       #
+# - If num_workers > 1, tests are processed in parallel, each in its    #
+#       own process                                                     #
+#       + output for each test is printed in order once test is done    #
+#       + errors are reported for each test without stopping the batch  #
+#                                                                       #
+# - Data for every chart group of a test is prepared first; if          #
+#       render_workers > 1, charts are then rendered in parallel        #
+#       + each line is decimated to the first, last, min, & max sample  #
+#           of fig_width * plot_resolution runs of samples, so peaks    #
+#           are kept while chart size & render time don't grow with the #
+#           length of the test                                          #
+#                                                                       #
+# - If update_data_store = True, data for each new or changed test is   #
+#       also saved to the multi-test store in store_dir (see            #
+#       data_store.py) so channels can be compared across a series      #
+#                                                                       #
+# - Stats of each channel plotted (see data_statistics.py) are saved to #
+#       <Test_Name>_Stats.csv in the test's chart directory             #
+#                                                                       #
+# - If plot_uncertainty = True, each line is drawn with a shaded 95 %   #
+#       uncertainty band from Monte Carlo draws of the uncertainty of   #
+#       its instrument (see data_uncertainty.py)                        #
+#       + band is evaluated at the samples drawn on the chart, so its   #
+#           cost doesn't grow with the length of the test               #
+#       + random (Type A) uncertainty of each channel is the standard   #
+#           deviation of its filtered data before ignition              #
+#                                                                       #
+# - If profile_run = True, wall time, CPU time, & peak memory of each   #
+#       stage of each test (load, time base, events, convert, filter,   #
+#       stats, & prep & render of each chart group) are recorded (see   #
+#       stage_profiling.py)                                             #
+#       + records are saved to run_log_<date>_<time>.csv & .json in     #
+#           log_dir; if print_profile_summary = True, totals for each   #
+#           stage & the slowest tests & charts are also printed         #
 # ********************************************************************* #
 
 # --------------- #
 # Import Packages #
 # --------------- #
-import os
+import io
+import json
+import hashlib
 import socket
+import traceback
+from datetime import datetime
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import seaborn as sns
-from scipy.signal import savgol_filter
 from itertools import cycle
-from nptdms import TdmsFile
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from tdms_conversion import convert_tdms_to_csv, read_tdms_event_table
+from data_loading import build_time_base, get_event_table, get_required_columns, get_sample_timestamps, \
+    get_source_key, get_test_files, load_test_data, read_events_file
+from data_processing import align_lagged_channels, convert_channel_data, default_filters, filter_channel_data, get_lag_times
+from data_statistics import get_channel_stats, integral_types, type_thresholds
+from data_uncertainty import get_type_A_sigmas, get_uncertainty_bands, type_uncertainties
+from data_store import update_store
+from stage_profiling import format_profile_summary, profile_stage, write_run_log
 
 # ---------------------------------- #
 # Define Subdirectories & Info Files #
 # ---------------------------------- #
 repo_dir = Path.cwd() / '..'
 info_dir = repo_dir / '01_Info'
+events_dir = info_dir / 'Events'
 data_dir = repo_dir / '02_Data'
 plot_dir = repo_dir / '04_Charts'
+manifest_file = plot_dir / 'chart_manifest.json'
+store_dir = repo_dir / '05_Data_Store'
+log_dir = plot_dir / 'Run_Logs'
 
 # Read in channel list file & create list of sensor groups
 channel_list = pd.read_csv(info_dir / 'channel_list.csv', index_col='Channel_Name')
@@ -49,7 +118,43 @@ test_info = pd.read_csv(info_dir / 'Test_Description.csv', index_col='Test')
 # ------------------- #
 # Set Plot Parameters #
 # ------------------- #
-plot_all = True    # if true, generate plots for every test
+plot_all = True    # if true, generate plots for every test; if false, only charts with changed inputs
+
+# If true, csv file formatted like those output by DAQ VI is also written for each TDMS file without one
+export_csv = False
+
+# Number of rows read from TDMS file & written to csv at a time; set to None to convert
+#   whole file at once (peak memory then scales with length of test)
+tdms_chunk_rows = 100000
+
+# If true, parsed data is cached as <Test_Name>.parquet in data_dir & only channels in channel list are loaded
+use_data_cache = True
+
+# Data type used to load channel data ('float32' uses half the memory of 'float64')
+data_float_dtype = 'float64'
+
+# If true, gas data is shifted back by its group's lag time (interpolated between samples) to line up with other data
+align_gas_data = True
+
+# If true, each line is drawn with 95 % uncertainty band from uncertainty_draws Monte Carlo draws
+plot_uncertainty = False
+uncertainty_draws = 500
+uncertainty_seed = 0
+
+# If true, every channel of each new or changed test is saved to memory-mapped multi-test store in store_dir
+#   + each test is parsed in full before plotting starts, so leave off for ordinary runs (compare_tests_plotter.py
+#       updates the store itself)
+update_data_store = False
+
+# Number of tests processed in parallel (each in its own process); set to 1 to process tests one at a time
+num_workers = 1
+
+# Number of charts for a test rendered in parallel (used only when num_workers = 1)
+render_workers = 1
+
+# If true, wall time, CPU time, & peak memory of each stage of each test are saved to run log in log_dir
+profile_run = False
+print_profile_summary = True
 
 # Set seaborn as default plot config; define line & background colors, list of markers
 sns.set()
@@ -68,139 +173,46 @@ legend_font = 10
 fig_width = 8
 fig_height = 6
 
-# ------------------------------------- #
-# Convert new .tdms files to .csv files #
-# ------------------------------------- #
-for file_name in os.listdir(data_dir):
-    if file_name.endswith('.tdms'):
-        # Grab csv file name from tdms file name
-        csv_name = file_name[:-21]
-
-        # Create new csv files if they don't exist in data dir
-        if not os.path.isfile(data_dir / f'{csv_name}.csv'):
-            print('    Creating data & event csv files for ' + csv_name)
-            # Read tdms file & convert to dataframe
-            tdms_file = TdmsFile(data_dir / file_name)
-            tdms_df = tdms_file.as_dataframe()
-
-            # Create empty dataframes for data & event info
-            data_df = pd.DataFrame()
-            event_df = pd.DataFrame()
-            # Loop through tdms file columns & populate dataframes
-            for column in tdms_df.columns:
-                if column.split('/')[1] == "'Channels'":
-                    data_df[column.split('/')[-1][1:-1]] = tdms_df[column]
-                elif column.split('/')[1] == "'Events'":
-                    event_df[column.split('/')[-1][1:-1]] = tdms_df[column].dropna()
-
-            data_df.set_index('Time', inplace=True)
-
-            # Add events col to data_df; info lines above header, & save as csv
-            data_df['Event'] = ''
-            if not event_df.empty:
-                event_df.set_index('Time', inplace=True)
-                for event_idx in event_df.index.values:
-                    idx = f'{event_idx[:10]} {event_idx[11:]}'
-                    if idx in data_df.index:
-                        data_df.loc[idx, 'Event'] = event_df.loc[event_idx, 'Event']
-                    else:
-                        ss = int(idx[-2:])
-                        if ss != 0:
-                            new_index = idx[:-2] + format(ss - 1, '02d')
-                        else:
-                            mm = int(idx[-5:-3])
-                            if mm != 0:
-                                new_index = idx[:-5] + format(mm - 1, '02d') + ':59'
-                            else:
-                                hh = int(idx[-8:-6])
-                                new_index = idx[:-8] + format(hh - 1, '02d') + ':'.join(['59', '59'])
-
-                        data_df.loc[new_index, 'Event'] = event_df.loc[event_idx, 'Event']
-
-            full_csv = open(data_dir / f'{csv_name}.csv', "w")
-            full_csv.write(f'Test Name,{csv_name}' + "\n")
-            for label in ['Engineer', 'Location', 'Test Info']:
-                full_csv.write(f'{label},' + "\n")
-            full_csv.write("\n")
-            full_csv.write("\n")
-            data_df.to_csv(full_csv, index_label='Time')
-            full_csv.close()
-
-            print('    Saved ' + csv_name + '.csv')
-            print()
-
-    elif file_name.endswith('.csv'):
-        # Drop timestamp from end of file name if present
-        if len(file_name.split('_')[-1]) == 19:
-            if len(file_name[-19:].split('-')) == 4:
-                os.rename(data_dir / file_name, data_dir / f'{file_name[:-20]}.csv')
+# Runs of samples per inch of figure width each line is decimated to (min & max of each run are plotted);
+#   set to None to plot every sample
+plot_resolution = 200
+
+# Primary & secondary y-axis labels for each data type ('None' if chart has no secondary axis)
+type_labels = {'Temperature': ['Temperature ($^\circ$C)', 'Temperature ($^\circ$F)'],
+               'Velocity': ['Velocity (m/s)', 'Velocity (mph)'],
+               'Differential Pressure': ['Pressure (Pa)', 'None'],
+               'Heat Flux': ['Heat Flux (kW/m$^2$)', 'None'],
+               'Radiant Heat Flux': ['Heat Flux (kW/m$^2$)', 'None'],
+               'Oxygen': ['Concentration (% vol)', 'None'],
+               'Carbon Monoxide': ['Concentration (% vol)', 'None'],
+               'Carbon Dioxide': ['Concentration (% vol)', 'None']}
+
+# Factors used to scale primary y-axis limits to secondary y-axis units
+secondary_axis_scales = {'Velocity (mph)': 2.23694}
+
+# Plot parameters & processing settings recorded in chart manifest (charts are regenerated when any of these change)
+plot_params = {'line_markers': line_markers, 'label_size': label_size, 'tick_size': tick_size,
+               'line_width': line_width, 'event_font': event_font, 'font_rotation': font_rotation,
+               'legend_font': legend_font, 'fig_width': fig_width, 'fig_height': fig_height,
+               'plot_resolution': plot_resolution, 'type_labels': type_labels,
+               'secondary_axis_scales': secondary_axis_scales, 'align_gas_data': align_gas_data,
+               'plot_uncertainty': plot_uncertainty, 'default_filters': default_filters,
+               'data_float_dtype': data_float_dtype, 'type_thresholds': type_thresholds,
+               'integral_types': integral_types}
+if plot_uncertainty:
+    plot_params.update({'uncertainty_draws': uncertainty_draws, 'uncertainty_seed': uncertainty_seed,
+                        'type_uncertainties': type_uncertainties})
 
 # ---------------------- #
 # User-Defined Functions #
 # ---------------------- #
-def timestamp_to_seconds(timestamp):
-    timestamp = timestamp.split(' ')[-1]
-    hh, mm, ss = timestamp.split(':')
-    return(3600 * int(hh) + 60 * int(mm) + int(ss))
-
-def convert_timestamps(timestamps, start_time):
-    raw_seconds = map(timestamp_to_seconds, timestamps)
-    return([s - start_time for s in list(raw_seconds)])
-
-def apply_savgol_filter(raw_data):
-    raw_data = raw_data.dropna().loc[0:]
-    converted_data = savgol_filter(raw_data, 51, 5)
-    filtered_data = pd.Series(converted_data, index=raw_data.index.values)
-    return(filtered_data.loc[0:])
-
-def prep_data_for_plot(scale_factor, offset, data_type)
-    y2_label = 'None'
-
-    if data_type == 'Temperature':
-        filtered_data = exp_data[channel].rolling(window=5, center=True).mean()
-        plot_data = filtered_data.dropna().loc[0:]
-        y1_label = 'Temperature ($^\circ$C)'
-        y2_label = 'Temperature ($^\circ$F)'
-
-    elif data_type == 'Velocity':
-        zeroed_data = exp_data.loc[:, channel] - exp_data.loc[:-1, channel].mean()
-        converted_data = np.sign(zeroed_data) * 0.0698 * ((exp_data[channel[0] + 'TC' + channel[3:]] + 273.15) * (scale_factor * abs(zeroed_data)))**0.5
-        plot_data = apply_savgol_filter(converted_data)
-        y1_label = 'Velocity (m/s)'
-        y2_label = 'Velocity (mph)'
-
-    elif data_type == 'Differential Pressure':
-        converted_data = scale_factor * exp_data[channel] + offset
-        zeroed_data = converted_data - converted_data.loc[:-1].mean()
-        plot_data = apply_savgol_filter(zeroed_data)
-        y1_label = 'Pressure (Pa)'
-
-    elif data_type == 'Heat Flux' or data_type == 'Radiant Heat Flux':
-        zeroed_data = exp_data[channel] - exp_data[channel].loc[:-1].mean()
-        converted_data = zeroed_data * scale_factor
-        plot_data = apply_savgol_filter(converted_data)
-        y1_label = 'Heat Flux (kW/m$^2$)'
-
-    elif any([data_type == string for string in ['Oxygen', 'Carbon Monoxide', 'Carbon Dioxide']]):
-        if data_type == 'Oxygen':
-            # Use next line for O2 ranging from 0-5 V (scale_factor = 5 in channel list)
-            # zeroed_data = exp_data.loc[:, channel] - (exp_data.loc[:lag_time - 1, channel].mean() - 5. * (20.98 / 25))
-            # Use next line for O2 ranging from 1-5 V (scale_factor = 6.25 in channel list)
-            zeroed_data = exp_data.loc[:, channel] - (exp_data.loc[:lag_time - 1, channel].mean() - 4. * (20.98 / 25) - 1) - 1
-        else:
-            zeroed_data = exp_data.loc[:, channel] - exp_data.loc[:lag_time - 1, channel].mean()
-        converted_data = scale_factor * zeroed_data + offset
-        filtered_data = converted_data.rolling(window=5, center=True).mean()
-        plot_data = filtered_data.dropna().loc[0:]
-        y1_label = 'Concentration (% vol)'
-
-    else:
-        print(f'Data type for {channel} not found!')
-        exit()
-
+def prep_data_for_plot(filtered_data, channel, data_type):
+    # Get filtered data for channel (without nan gaps) & y-axis labels based on data type
+    plot_data = filtered_data[channel].dropna()
+    y1_label, y2_label = type_labels[data_type]
     return(plot_data, y1_label, y2_label)
 
-def format_and_save_plot(y_lims, x_lims, y2_label, file_loc):
+def format_and_save_plot(fig, ax1, y_lims, x_lims, y2_label, event_times, event_labels, file_loc):
     # Set tick parameters
     ax1.tick_params(labelsize=tick_size, length=0, width=0)
 
@@ -213,105 +225,336 @@ def format_and_save_plot(y_lims, x_lims, y2_label, file_loc):
     if y2_label != 'None':
         ax2 = ax1.twinx()
         ax2.tick_params(labelsize=tick_size, length=0, width=0)
-        ax2.set_ylabel(secondary_axis_label, fontsize=label_size)
+        ax2.set_ylabel(y2_label, fontsize=label_size)
         if y2_label == 'Temperature ($^\circ$F)':
             ax2.set_ylim([y_lims[0] * 1.8 + 32., y_lims[1] * 1.8 + 32.])
         else:
-            ax2.set_ylim([secondary_axis_scale * y_lims[0], secondary_axis_scale * y_lims[1]])
+            ax2.set_ylim([secondary_axis_scales[y2_label] * y_lims[0], secondary_axis_scales[y2_label] * y_lims[1]])
 
-        ax2.yaxis.grid(b=None)
+        ax2.yaxis.grid(False)
 
     # Add labels for timing information (if available)
     ax3 = ax1.twiny()
     ax3.set_xlim(left=x_lims[0] - x_lims[1] / 400, right=x_lims[1])
-    ax3.set_xticks(exp_data[pd.notna(exp_data['Event'])].index.values)
+    ax3.set_xticks(event_times)
     ax3.tick_params(axis='x', width=1, labelrotation=font_rotation, labelsize=event_font)
-    ax3.set_xticklabels(exp_data[pd.notna(exp_data['Event'])]['Event'].values, fontsize=event_font, ha='left')
-    ax3.xaxis.grid(b=None)
+    ax3.set_xticklabels(event_labels, fontsize=event_font, ha='left')
+    ax3.xaxis.grid(False)
 
-    # Add legend, clean up whitespace padding, save chart as pdf, & close fig
+    # Add legend, clean up whitespace padding, & save chart as pdf
     handles1, labels1 = ax1.get_legend_handles_labels()
     ax1.legend(handles1, labels1, loc='best', fontsize=legend_font, handlelength=3, frameon=True, framealpha=0.75)
     fig.tight_layout()
-    plt.savefig(file_loc)
-    plt.close()
-
-# ----------------- #
-# Main Body of Code #
-# ----------------- #
-# Determine which test data to plot
-data_file_ls = []
-for f in data_dir.iterdir():
-    if f.suffix == '.csv':
-        if plot_all:
-            data_file_ls.append(f.name)
-        else:
-            if not (plot_dir / f.name[:-4]).exists():
-                data_file_ls.append(f.name)
-
-# Loop through test data files & create plots
-for f in data_file_ls:
-    # Read in data for experiment & replace blank fields with nan
-    exp_data = pd.read_csv(data_dir / f, skiprows=6)
-    exp_data.replace(r'^\s*$', np.nan, regex=True, inplace=True)
-
-    # Get test name from file
-    Test_Name = f[:-4]
+    fig.savefig(file_loc)
+
+def get_line_band(filtered_data, channel, exp_data, type_A_sigmas):
+    # Get (times, lower, upper) of uncertainty band of channel at samples drawn on chart (None if type has no band)
+    if channel_list.loc[channel, 'Type'] not in type_uncertainties:
+        return(None)
+
+    # Rows of filtered_data kept after nan gaps are dropped & line is decimated; raw data (which also has samples
+    #   before ignition) is matched to them by time
+    rows = np.flatnonzero(filtered_data[channel].notna().to_numpy())
+    rows = rows[get_decimated_rows(filtered_data[channel].to_numpy()[rows])]
+    lower, upper = get_uncertainty_bands(filtered_data.iloc[rows], channel_list.loc[[channel]],
+                                         exp_data.loc[filtered_data.index[rows]], uncertainty_draws, type_A_sigmas,
+                                         uncertainty_seed)
+    return(filtered_data.index.values[rows], lower[channel].values, upper[channel].values)
+
+def prep_group_plot(filtered_data, group, event_table, band_inputs=None):
+    # Collect filtered data for each channel in group & everything else needed to render group's chart
+    #   + if band_inputs ((raw data, Type A sigmas)) are given, uncertainty band of each line is included
+    x_max, y_min, y_max = 0, 0, 0
+    plot_lines = []
+
+    for channel in channel_groups.get_group(group).index.values:
+        # Get data & set plot parameters based on data type
+        data_type = channel_list.loc[channel,'Type']
+        plot_data, y1_label, y2_label = prep_data_for_plot(filtered_data, channel, data_type)
+        band = None if band_inputs is None else get_line_band(filtered_data, channel, *band_inputs)
+        plot_lines.append((channel_list.loc[channel, 'Label'], plot_data.index.values, plot_data.values, band))
+
+        # Check if x_max, y_min, y_max need updating (band is included in y limits)
+        y_data = plot_data if band is None else np.concatenate([plot_data.values, band[1], band[2]])
+        if plot_data.index.values[-1] > x_max:
+            x_max = plot_data.index.values[-1]
+        if np.nanmin(y_data) - abs(np.nanmin(y_data) * .1) < y_min:
+            y_min = np.nanmin(y_data) - abs(np.nanmin(y_data) * .1)
+        if np.nanmax(y_data) * 1.1 > y_max:
+            y_max = np.nanmax(y_data) * 1.1
+
+    return({'lines': plot_lines, 'y1_label': y1_label, 'y2_label': y2_label, 'y_lims': [y_min, y_max],
+            'x_lims': [0, x_max], 'event_times': event_table['Time'].values,
+            'event_labels': event_table['Event'].values})
+
+def get_decimated_rows(y_data):
+    # Get rows of first, last, min, & max sample of each of fig_width * plot_resolution runs of samples in y_data
+    num_runs = None if plot_resolution is None else int(fig_width * plot_resolution)
+    if num_runs is None or len(y_data) <= 2 * num_runs:
+        return(np.arange(len(y_data)))
+
+    # Split samples into runs of equal length; samples left over form one last, shorter run
+    run_length = -(-len(y_data) // num_runs)
+    run_starts = np.arange(0, len(y_data), run_length)
+    full_runs = y_data[:len(y_data) // run_length * run_length].reshape(-1, run_length)
+    rows = [run_starts[:len(full_runs)] + full_runs.argmin(axis=1),
+            run_starts[:len(full_runs)] + full_runs.argmax(axis=1), [0, len(y_data) - 1]]
+    if len(run_starts) > len(full_runs):
+        rows.append(run_starts[-1] + np.array([y_data[run_starts[-1]:].argmin(), y_data[run_starts[-1]:].argmax()]))
+
+    return(np.unique(np.concatenate(rows)))
+
+def get_marker_spacing(num_samples, num_plotted):
+    # Number of plotted points between markers; marker about every 60 samples of data, but no more than 60 per line
+    return(max(1, round(60 * num_plotted / num_samples), num_plotted // 60))
+
+def render_group_plot(group_plot, file_loc):
+    # Create figure without pyplot so charts can be rendered in parallel processes
+    fig = Figure(figsize=(fig_width, fig_height))
+    ax1 = fig.add_subplot()
+    plot_markers = cycle(line_markers)
+
+    # Plot data from each channel associated with group
+    for label, x_data, y_data, band in group_plot['lines']:
+        rows = get_decimated_rows(y_data)
+        line = ax1.plot(x_data[rows], y_data[rows], lw=line_width, marker=next(plot_markers),
+            markevery=get_marker_spacing(len(y_data), len(rows)), mew=3, mec='none', ms=7, label=label)[0]
+        if band is not None:
+            ax1.fill_between(*band, color=line.get_color(), alpha=0.3, lw=0)
+
+    # Add vertical lines for event labels; label to y axis
+    [ax1.axvline(_x, color='0.25', lw=1) for _x in group_plot['event_times']]
+    ax1.set_ylabel(group_plot['y1_label'], fontsize=label_size)
+
+    format_and_save_plot(fig, ax1, group_plot['y_lims'], group_plot['x_lims'], group_plot['y2_label'],
+        group_plot['event_times'], group_plot['event_labels'], file_loc)
+
+def get_hash(*inputs):
+    # Hash inputs (as json) so changes to chart inputs can be detected
+    return(hashlib.sha1(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest())
+
+def get_chart_keys(Test_Name, data_path):
+    # Get key of inputs used to create each group's chart for test in data file at data_path
+    data_key = get_source_key(data_path)
+    test_row = test_info.loc[Test_Name].to_json() if Test_Name in test_info.index else ''
+    events_file = events_dir / f'{Test_Name}_Events.csv'
+    events_key = get_source_key(events_file) if events_file.exists() else ''
+    return({group: get_hash(data_key, channel_groups.get_group(group).to_csv(), test_row, events_key, plot_params)
+            for group in channel_groups.groups})
+
+def save_test_stats(test_stats, stats_file):
+    # Save stats to csv; stats of channels not recomputed are kept if they're still in channel list
+    if stats_file.exists():
+        old_stats = pd.read_csv(stats_file, index_col='Channel')
+        old_stats = old_stats[old_stats.index.isin(channel_list.index) & ~old_stats.index.isin(test_stats.index)]
+        test_stats = pd.concat([old_stats, test_stats])
+
+    test_stats = test_stats.loc[[channel for channel in channel_list.index if channel in test_stats.index]]
+    test_stats.round(3).to_csv(stats_file)
+
+def get_event_sources(Test_Name, data_path):
+    # Read events for test from events file in events_dir & TDMS file in data_dir (if they exist)
+    #   + events of TDMS file test was loaded from are already in its 'Event' column
+    event_sources = []
+    events_file = events_dir / f'{Test_Name}_Events.csv'
+    if events_file.exists():
+        event_sources.append(read_events_file(events_file))
+    for tdms_path in data_dir.glob(f'{Test_Name}_*.tdms'):
+        if tdms_path.name[:-21] == Test_Name and tdms_path != data_path:
+            event_sources.append(read_tdms_event_table(tdms_path))
+
+    return(event_sources)
+
+def render_group_chart(Test_Name, group, group_plot, file_loc, profile=False):
+    # Render & save chart for group; returns list with record of render stage if profile is true (otherwise empty)
+    stage_records = [] if profile else None
+    with profile_stage(stage_records, Test_Name, 'render', group) as stage_info:
+        stage_info['Channels'] = len(group_plot['lines'])
+        render_group_plot(group_plot, file_loc)
+
+    return(stage_records or [])
+
+def plot_test(Test_Name, data_path, groups):
+    # Load, convert, filter, & plot groups for test in data file at data_path
+    #   + returns (test name, printed output, error, records of each stage (empty unless profile_run = True))
+    output = io.StringIO()
+    stage_records = [] if profile_run else None
+    try:
+        with redirect_stdout(output):
+            plot_test_data(Test_Name, data_path, groups, stage_records)
+    except Exception:
+        return(Test_Name, output.getvalue(), traceback.format_exc(), stage_records or [])
+
+    return(Test_Name, output.getvalue(), None, stage_records or [])
+
+def plot_test_data(Test_Name, data_path, groups, stage_records=None):
+    # Read in data for experiment (blank fields replaced with nan) from cache, csv, or TDMS file
+    with profile_stage(stage_records, Test_Name, 'load') as stage_info:
+        exp_data = load_test_data(data_path, get_required_columns(channel_list), use_data_cache, data_float_dtype,
+                                  data_dir / f'{Test_Name}.parquet')
+        stage_info.update({'File Type': data_path.suffix[1:], 'Rows': len(exp_data), 'Channels': exp_data.shape[1]})
     print (f'--- Loaded data file for {Test_Name} ---')
 
     # Create index column of time relative to ignition in exp_data
-    exp_data.rename(columns={'Time':'Timestamp'}, inplace=True)
-    ignition_idx_ls = exp_data.index[exp_data['Event'] == 'Ignition'].tolist()
-    start_timestamp = exp_data.loc[ignition_idx_ls[-1], 'Timestamp'].split(' ')[-1]
-    hh,mm,ss = start_timestamp.split(':')
-    start_time = 3600 * int(hh) + 60 * int(mm) + int(ss)
-    exp_data['Time'] = convert_timestamps(exp_data['Timestamp'], start_time)
+    with profile_stage(stage_records, Test_Name, 'time_base'):
+        exp_data.rename(columns={'Time':'Timestamp'}, inplace=True)
+        timestamps = get_sample_timestamps(exp_data['Timestamp'])
+        exp_data['Time'] = build_time_base(timestamps, exp_data['Event'], 'Ignition')
 
-    exp_data = exp_data.set_index('Time')
+        exp_data = exp_data.set_index('Time')
 
     # Define name of dir for experiment's plots & create if needed
     save_dir = plot_dir / Test_Name
     save_dir.mkdir(parents=True, exist_ok=True)
 
-    # Loop through channel groups & generate data plots for each
-    for group in channel_groups.groups:
+    # Get time & label of each event once for all charts from Event column, events file, & TDMS file
+    with profile_stage(stage_records, Test_Name, 'events'):
+        event_table = get_event_table(exp_data.index.values, timestamps, exp_data['Event'],
+                                      get_event_sources(Test_Name, data_path))
+
+    # Convert data for all channels in groups being plotted (zeroing gas channels using their group's lag time)
+    group_channels = channel_list[channel_list['Chart'].isin(groups)]
+    with profile_stage(stage_records, Test_Name, 'convert') as stage_info:
+        stage_info['Channels'] = len(group_channels)
+        lag_times = get_lag_times(group_channels, test_info, Test_Name)
+        converted_data = convert_channel_data(exp_data, group_channels, lag_times)
+        if align_gas_data:
+            converted_data = align_lagged_channels(converted_data, lag_times)
+
+    # Filter data for all channels being plotted, batching channels with the same filter settings
+    with profile_stage(stage_records, Test_Name, 'filter') as stage_info:
+        stage_info['Channels'] = len(group_channels)
+        filtered_data = filter_channel_data(converted_data, group_channels)
+
+    # Random (Type A) uncertainty of each line used for uncertainty bands, from filtered data before ignition
+    #   (filtered_data only starts at ignition)
+    band_inputs = None
+    if plot_uncertainty:
+        pre_ignition_data = filter_channel_data(converted_data[converted_data.index.values < 0], group_channels, None)
+        band_inputs = (exp_data, get_type_A_sigmas(pre_ignition_data))
+
+    # Compute stats for all channels being plotted in one pass over filtered data
+    with profile_stage(stage_records, Test_Name, 'stats') as stage_info:
+        stage_info['Channels'] = len(group_channels)
+        save_test_stats(get_channel_stats(filtered_data, group_channels), save_dir / f'{Test_Name}_Stats.csv')
+
+    # Loop through channel groups & prepare data for each plot
+    group_plots = {}
+    for group in groups:
         print (f"  Plotting {group.replace('_',' ')}")
+        with profile_stage(stage_records, Test_Name, 'prep', group) as stage_info:
+            stage_info['Channels'] = len(channel_groups.get_group(group))
+            group_plots[group] = prep_group_plot(filtered_data, group, event_table, band_inputs)
+
+    # Render & save chart for each group (in parallel if render_workers > 1)
+    render_args = [[Test_Name] * len(group_plots), list(group_plots), list(group_plots.values()),
+                   [save_dir / f'{group}.pdf' for group in group_plots], [stage_records is not None] * len(group_plots)]
+    if render_workers > 1 and num_workers == 1:
+        with ProcessPoolExecutor(max_workers=render_workers) as executor:
+            render_records = list(executor.map(render_group_chart, *render_args))
+    else:
+        render_records = list(map(render_group_chart, *render_args))
+    if stage_records is not None:
+        stage_records += [record for records in render_records for record in records]
 
-        # Create figure for data plot(s)
-        fig, ax1 = plt.subplots(figsize=(fig_width, fig_height))
-        plot_markers = cycle(line_markers)
-        x_max, y_min, y_max = 0, 0, 0
-
-        if group.endswith('_Gas'):
-            lag_time = test_info.loc[Test_Name, group]
-
-        # Plot data from each channel associated with group
-        for channel in channel_groups.get_group(group).index.values:
-            # Get scale factor, offset, & data type based on channel list
-            scale_factor = channel_list.loc[channel,'Scale']
-            offset = channel_list.loc[channel,'Offset']
-            data_type = channel_list.loc[channel,'Type']
-
-            # Zero/filter data & set plot parameters based on data type
-            plot_data, y1_label, y2_label = prep_data_for_plot(scale_factor, offset, data_type)
-
-            # Plot channel data
-            ax1.plot([i for i in plot_data.index], [y for y in plot_data.values], lw=line_width,
-                marker=next(plot_markers), markevery=60, mew=3, mec='none', ms=7, 
-                label=channel_list.loc[channel, 'Label'])
-
-            # Check if x_max, y_min, y_max need updating
-            if len(plot_data) > x_max:
-                x_max = len(plot_data)
-            if min(plot_data) - abs(min(plot_data) * .1) < y_min:
-                y_min = min(plot_data) - abs(min(plot_data) * .1)
-            if max(plot_data) * 1.1 > y_max:
-                y_max = max(plot_data) * 1.1
+    print()
 
-        # Add vertical lines for event labels; label to y axis
-        [ax1.axvline(_x, color='0.25', lw=1) for _x in exp_data[pd.notna(exp_data['Event'])].index.values]
-        ax1.set_ylabel(y1_label, fontsize=label_size)
+# ----------------- #
+# Main Body of Code #
+# ----------------- #
+if __name__ == '__main__':
+    # Find data file of each test (TDMS file if test has csv & TDMS files)
+    test_files = get_test_files(data_dir)
+
+    # Write csv files for TDMS files without one in background while tests are plotted
+    csv_executor = ProcessPoolExecutor(max_workers=1) if export_csv else None
+    csv_exports = {}
+    if csv_executor:
+        for Test_Name, data_path in test_files.items():
+            if data_path.suffix == '.tdms' and not (data_dir / f'{Test_Name}.csv').exists():
+                print(f'    Writing {Test_Name}.csv in background')
+                csv_exports[Test_Name] = csv_executor.submit(convert_tdms_to_csv, data_path,
+                                                             data_dir / f'{Test_Name}.csv', Test_Name, tdms_chunk_rows)
+
+    # Save new or changed tests to multi-test store (all channels, not just those in channel list)
+    run_records = [] if profile_run else None
+    if update_data_store:
+        with profile_stage(run_records, '', 'update_store'):
+            saved_tests = update_store(store_dir, test_files, None, use_data_cache, data_float_dtype)
+        if saved_tests:
+            print()
 
-        format_and_save_plot([y_min, y_max], [0, x_max], y2_label, save_dir / f'{group}.pdf')
+    # Load inputs used to create charts during previous runs
+    chart_manifest = {}
+    if manifest_file.exists():
+        with open(manifest_file) as manifest:
+            chart_manifest = json.load(manifest)
+
+    # Determine which test data to plot & which of its charts need to be (re)generated
+    test_ls, data_file_ls, test_groups, test_chart_keys = [], [], [], {}
+    for Test_Name, data_path in test_files.items():
+        chart_keys = get_chart_keys(Test_Name, data_path)
+        old_keys = chart_manifest.get(Test_Name, {})
+        if plot_all:
+            groups = list(chart_keys)
+        else:
+            groups = [group for group in chart_keys if old_keys.get(group) != chart_keys[group]
+                      or not (plot_dir / Test_Name / f'{group}.pdf').exists()]
+
+        if groups:
+            test_ls.append(Test_Name)
+            data_file_ls.append(data_path)
+            test_groups.append(groups)
+            test_chart_keys[Test_Name] = chart_keys
+        else:
+            print(f'--- Charts for {Test_Name} are up to date ---')
 
-    print()
\ No newline at end of file
+    # Process tests (in worker processes if num_workers > 1); output is printed in order of test_ls
+    executor = ProcessPoolExecutor(max_workers=num_workers) if num_workers > 1 else None
+    if executor:
+        test_results = executor.map(plot_test, test_ls, data_file_ls, test_groups)
+    else:
+        test_results = map(plot_test, test_ls, data_file_ls, test_groups)
+
+    failed_tests = []
+    for (Test_Name, test_output, error, stage_records), groups in zip(test_results, test_groups):
+        print(test_output, end='')
+        if run_records is not None:
+            run_records += stage_records
+        if error is not None:
+            print(f'--- Error while plotting {Test_Name} ---')
+            print(error)
+            failed_tests.append(Test_Name)
+            continue
+
+        # Record inputs of regenerated charts (groups no longer in channel list are dropped)
+        chart_manifest[Test_Name] = {group: key for group, key in chart_manifest.get(Test_Name, {}).items()
+                                     if group in test_chart_keys[Test_Name]}
+        chart_manifest[Test_Name].update({group: test_chart_keys[Test_Name][group] for group in groups})
+        plot_dir.mkdir(parents=True, exist_ok=True)
+        with open(manifest_file, 'w') as manifest:
+            json.dump(chart_manifest, manifest, indent=4, sort_keys=True)
+
+    if executor:
+        executor.shutdown()
+
+    # Wait for csv files still being written
+    for Test_Name, csv_export in csv_exports.items():
+        if csv_export.exception() is not None:
+            print(f'--- Error while writing {Test_Name}.csv: {csv_export.exception()} ---')
+        else:
+            print(f'    Saved {Test_Name}.csv')
+    if csv_executor:
+        csv_executor.shutdown()
+
+    if failed_tests:
+        print(f'Plots not completed for {len(failed_tests)} test(s): ' + ', '.join(failed_tests))
+
+    # Save time & memory of each stage of run
+    if run_records:
+        log_path = log_dir / f"run_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        write_run_log(run_records, log_path)
+        print(f'Saved run log to {log_path}.csv & .json')
+        if print_profile_summary:
+            print()
+            print(format_profile_summary(run_records))
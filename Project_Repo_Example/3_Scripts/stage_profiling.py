@@ -0,0 +1,97 @@
+# stage_profiling.py
+# ***************************** Run Notes ***************************** #
+# - Functions used to record wall time, CPU time, & peak memory of each #
+#       stage of processing a test (e.g. loading data or rendering a    #
+#       chart) & save them as a run log                                 #
+#                                                                       #
+# - Each stage is one record (dict) with test name, chart group (blank  #
+#       for stages run once per test), stage name, any other info given #
+#       by the stage (e.g. number of rows), & the measurements          #
+#       + records are kept in a list, so records made in worker         #
+#           processes can be returned & combined with the rest          #
+#       + if list of records is None, nothing is measured or recorded   #
+#       + stages that raise an error are still recorded, with the error #
+#           in 'Error'                                                  #
+#                                                                       #
+# - Peak memory is the most memory allocated during stage beyond what   #
+#       was allocated when it started, as traced by tracemalloc         #
+#       + tracing is started by the first stage recorded in a process & #
+#           slows down code that allocates many small Python objects    #
+#       + stages shouldn't be nested, since each stage resets the peak  #
+# ********************************************************************* #
+
+# --------------- #
+# Import Packages #
+# --------------- #
+import time
+import tracemalloc
+import pandas as pd
+from contextlib import contextmanager
+
+# Measurements in each record (listed after other info in run log)
+measure_columns = ['Wall Time (s)', 'CPU Time (s)', 'Peak Memory (MB)']
+
+# ---------------------- #
+# User-Defined Functions #
+# ---------------------- #
+@contextmanager
+def profile_stage(stage_records, Test_Name, stage, group=''):
+    # Measure code run in with block & append its record to stage_records (unless None)
+    #   + yields dict that the block can fill with other info to record (e.g. {'Rows': len(exp_data)})
+    stage_info = {}
+    if stage_records is None:
+        yield stage_info
+        return
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+
+    # Stage is recorded even if block raises an error (with error in 'Error'), so failed stages stay in run log
+    try:
+        yield stage_info
+    except BaseException as error:
+        stage_info['Error'] = f'{type(error).__name__}: {error}'
+        raise
+    finally:
+        wall_time, cpu_time = time.perf_counter() - start_wall, time.process_time() - start_cpu
+        stage_records.append({'Test': Test_Name, 'Group': group, 'Stage': stage, **stage_info,
+                              'Wall Time (s)': wall_time, 'CPU Time (s)': cpu_time,
+                              'Peak Memory (MB)': (tracemalloc.get_traced_memory()[1] - start_memory) / 1e6})
+
+def write_run_log(stage_records, log_path):
+    # Save records of every stage to log_path with .csv & .json suffixes (stages run once per run have no test name)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    run_log = pd.DataFrame(stage_records)
+    run_log = run_log[[col for col in run_log.columns if col not in measure_columns] + measure_columns]
+    run_log.round(4).to_csv(log_path.with_suffix('.csv'), index=False)
+    run_log.round(4).to_json(log_path.with_suffix('.json'), orient='records', indent=4)
+
+def get_profile_summary(stage_records, num_rows=10):
+    # Summarize records; returns (totals for each stage, num_rows slowest tests, num_rows slowest chart groups)
+    run_log = pd.DataFrame(stage_records)
+    stage_summary = run_log.groupby('Stage', sort=False).agg(
+        Count=('Wall Time (s)', 'size'), Total_Wall=('Wall Time (s)', 'sum'), Mean_Wall=('Wall Time (s)', 'mean'),
+        Max_Wall=('Wall Time (s)', 'max'), Total_CPU=('CPU Time (s)', 'sum'),
+        Max_Peak_Memory=('Peak Memory (MB)', 'max'))
+
+    test_log = run_log[run_log['Test'] != '']
+    test_summary = test_log.groupby('Test').agg(Total_Wall=('Wall Time (s)', 'sum'),
+                                                Max_Peak_Memory=('Peak Memory (MB)', 'max'))
+    test_summary = test_summary.sort_values('Total_Wall', ascending=False).head(num_rows)
+
+    group_log = run_log[run_log['Group'] != '']
+    group_summary = group_log.groupby(['Test', 'Group']).agg(Total_Wall=('Wall Time (s)', 'sum'),
+                                                             Max_Peak_Memory=('Peak Memory (MB)', 'max'))
+    group_summary = group_summary.sort_values('Total_Wall', ascending=False).head(num_rows)
+
+    return(stage_summary, test_summary, group_summary)
+
+def format_profile_summary(stage_records, num_rows=10):
+    # Format summary of records as tables to print (times in s, memory in MB)
+    stage_summary, test_summary, group_summary = get_profile_summary(stage_records, num_rows)
+    return('\n'.join(['--- Time & memory of each stage ---', stage_summary.round(3).to_string(), '',
+                      f'--- Slowest {len(test_summary)} test(s) ---', test_summary.round(3).to_string(), '',
+                      f'--- Slowest {len(group_summary)} chart(s) ---', group_summary.round(3).to_string()]))
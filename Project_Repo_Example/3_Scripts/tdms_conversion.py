@@ -0,0 +1,189 @@
+# tdms_conversion.py
+# ***************************** Run Notes ***************************** #
+# - Functions used to read TDMS files output by v2.3.1.1 of DAQ VI      #
+#       directly as DataFrames or convert them to csv files formatted   #
+#       like csv files output by DAQ VI                                 #
+#       + only requested channels are read when loading a DataFrame &   #
+#           timestamps are parsed once                                  #
+#                                                                       #
+# - Streaming conversion reads the 'Channels' group in blocks of        #
+#       chunk_rows rows & appends each block to the csv, so peak memory #
+#       depends on chunk_rows instead of the length of the test         #
+#       + 'Events' group is small & is read in full                     #
+#                                                                       #
+# - Events are matched to the sample at or immediately before them by   #
+#       a single sorted search over parsed datetime64 timestamps        #
+# ********************************************************************* #
+
+# --------------- #
+# Import Packages #
+# --------------- #
+import numpy as np
+import pandas as pd
+from nptdms import TdmsFile
+from data_loading import parse_timestamps, text_columns
+
+# ---------------------- #
+# User-Defined Functions #
+# ---------------------- #
+def write_csv_header(csv_file, test_name):
+    # Write info lines that precede data header in csv files output by DAQ VI
+    csv_file.write(f'Test Name,{test_name}' + '\n')
+    for label in ['Engineer', 'Location', 'Test Info']:
+        csv_file.write(f'{label},' + '\n')
+    csv_file.write('\n')
+    csv_file.write('\n')
+
+def read_tdms_events(tdms_file):
+    # Return df of events indexed by timestamp (empty if file has no 'Events' group)
+    group_names = [group.name for group in tdms_file.groups()]
+    if 'Events' not in group_names:
+        return(pd.DataFrame())
+
+    event_df = pd.DataFrame({channel.name: pd.Series(channel[:]) for channel in tdms_file['Events'].channels()})
+    event_df = event_df.dropna()
+    if event_df.empty:
+        return(event_df)
+
+    return(event_df.set_index('Time'))
+
+def read_tdms_event_table(tdms_path):
+    # Return df of 'Timestamp' (datetime64) & 'Event' of each event in tdms file, without reading channel data
+    with TdmsFile.open(tdms_path) as tdms_file:
+        event_df = read_tdms_events(tdms_file)
+
+    if event_df.empty:
+        return(pd.DataFrame(columns=['Timestamp', 'Event']))
+
+    return(pd.DataFrame({'Timestamp': parse_timestamps(event_df.index.values), 'Event': event_df['Event'].values}))
+
+def read_tdms_times(time_channel, chunk_rows=None):
+    # Parse 'Time' channel to datetime64 array, reading chunk_rows rows at a time if given
+    if chunk_rows is None:
+        return(parse_timestamps(time_channel[:]))
+
+    return(np.concatenate([parse_timestamps(time_channel.read_data(offset=start_row, length=chunk_rows))
+                           for start_row in range(0, len(time_channel), chunk_rows)]))
+
+def align_events(data_times, event_df):
+    # Return row of sample at or immediately preceding each event (-1 if event precedes all data)
+    event_times = parse_timestamps(event_df.index.values)
+    return(np.searchsorted(data_times, event_times, side='right') - 1)
+
+def get_event_labels(event_rows, events, start_row, num_rows):
+    # Return event labels for rows start_row to start_row + num_rows; events sharing a sample are joined
+    labels = np.full(num_rows, '', dtype=object)
+    in_block = (event_rows >= start_row) & (event_rows < start_row + num_rows)
+    if in_block.any():
+        block_events = pd.Series(events[in_block]).groupby(event_rows[in_block] - start_row).agg('; '.join)
+        labels[block_events.index.values] = block_events.values
+
+    return(labels)
+
+def convert_tdms_to_csv(tdms_path, csv_path, test_name, chunk_rows=None):
+    # Convert tdms file to csv; if chunk_rows is None, whole file is loaded at once
+    if chunk_rows is None:
+        tdms_file = TdmsFile.read(tdms_path)
+        event_df = read_tdms_events(tdms_file)
+        data_df = pd.DataFrame({channel.name: pd.Series(channel[:]) for channel in tdms_file['Channels'].channels()})
+
+        # Match each event to its sample in one sorted search over parsed timestamps
+        data_df['Event'] = ''
+        if not event_df.empty:
+            event_rows = align_events(parse_timestamps(data_df['Time']), event_df)
+            data_df['Event'] = get_event_labels(event_rows, event_df['Event'].values.astype(str), 0, len(data_df))
+
+        with open(csv_path, 'w', newline='') as csv_file:
+            write_csv_header(csv_file, test_name)
+            data_df.set_index('Time').to_csv(csv_file, index_label='Time')
+        return
+
+    # Open tdms file without reading data; channel data is read as needed below
+    with TdmsFile.open(tdms_path) as tdms_file:
+        event_df = read_tdms_events(tdms_file)
+        data_channels = tdms_file['Channels'].channels()
+        num_rows = max(len(channel) for channel in data_channels)
+
+        # Match each event to its sample in one sorted search over parsed timestamps
+        if event_df.empty:
+            event_rows, events = np.array([], dtype=int), np.array([], dtype=object)
+        else:
+            event_rows = align_events(read_tdms_times(tdms_file['Channels']['Time'], chunk_rows), event_df)
+            events = event_df['Event'].values.astype(str)
+
+        with open(csv_path, 'w', newline='') as csv_file:
+            write_csv_header(csv_file, test_name)
+
+            # Read, convert, & append data chunk_rows rows at a time
+            for start_row in range(0, num_rows, chunk_rows):
+                chunk_df = pd.DataFrame({channel.name: pd.Series(channel.read_data(offset=start_row, length=chunk_rows))
+                                         for channel in data_channels})
+                chunk_df['Event'] = get_event_labels(event_rows, events, start_row, len(chunk_df))
+
+                chunk_df.set_index('Time').to_csv(csv_file, header=(start_row == 0), index_label='Time')
+
+def read_tdms_columns(tdms_path):
+    # Get names of columns in tdms file as loaded by read_tdms_data, without reading channel data
+    with TdmsFile.open(tdms_path) as tdms_file:
+        return([channel.name for channel in tdms_file['Channels'].channels()] + ['Event'])
+
+def read_tdms_data(tdms_path, columns=None, float_dtype='float64'):
+    # Read columns of 'Channels' group as df (channels as float_dtype, 'Time' as datetime64) with 'Event' column
+    #   + events are labelled on the sample at or immediately before them, as in converted csv files
+    with TdmsFile.open(tdms_path) as tdms_file:
+        data_channels = {channel.name: channel for channel in tdms_file['Channels'].channels()}
+        if columns is None:
+            columns = list(data_channels) + ['Event']
+
+        # Timestamps are needed to place events, so they're parsed even if 'Time' isn't requested
+        times = parse_timestamps(data_channels['Time'].read_data())
+        exp_data = {}
+        for name in [col for col in columns if col in data_channels]:
+            if name == 'Time':
+                exp_data[name] = pd.Series(times)
+            elif name in text_columns:
+                exp_data[name] = pd.Series(data_channels[name].read_data())
+            else:
+                exp_data[name] = pd.Series(data_channels[name].read_data(), dtype=float_dtype)
+        exp_data = pd.DataFrame(exp_data)
+        event_df = read_tdms_events(tdms_file)
+
+    if 'Event' in columns:
+        exp_data['Event'] = np.nan
+        if not event_df.empty:
+            event_rows = align_events(times, event_df)
+            event_labels = get_event_labels(event_rows, event_df['Event'].values.astype(str), 0, len(exp_data))
+            exp_data['Event'] = np.where(event_labels == '', np.nan, event_labels)
+
+    return(exp_data)
+
+def read_new_tdms_rows(tdms_path, start_row=0):
+    # Read rows appended to 'Channels' group since start_row; returns (new rows with 'Event' column or None, new start_row)
+    with TdmsFile.open(tdms_path) as tdms_file:
+        data_channels = tdms_file['Channels'].channels()
+        num_rows = min(len(channel) for channel in data_channels)
+        if num_rows <= start_row:
+            return(None, start_row)
+
+        new_rows = pd.DataFrame({channel.name: pd.Series(channel.read_data(offset=start_row, length=num_rows - start_row))
+                                 for channel in data_channels})
+        event_df = read_tdms_events(tdms_file)
+        prev_time = parse_timestamps(tdms_file['Channels']['Time'].read_data(offset=start_row - 1, length=1))[0] \
+            if start_row > 0 and not event_df.empty else None
+
+    # Label new rows with events; events at or before last row of earlier reads were placed during those reads &
+    #   events after last new row are placed during later reads
+    #   + events logged between last row of earlier reads & first new row were left for this read & are placed
+    #       on first new row
+    new_rows['Event'] = np.nan
+    if not event_df.empty:
+        new_times = parse_timestamps(new_rows['Time'])
+        event_times = parse_timestamps(event_df.index.values)
+        event_rows = align_events(new_times, event_df)
+        if prev_time is not None:
+            event_rows[(event_rows < 0) & (event_times > prev_time)] = 0
+        event_rows[event_times > new_times[-1]] = -1
+        event_labels = get_event_labels(event_rows, event_df['Event'].values.astype(str), 0, len(new_rows))
+        new_rows['Event'] = np.where(event_labels == '', np.nan, event_labels)
+
+    return(new_rows, num_rows)
@@ -0,0 +1,296 @@
+# bib_index.py
+# ***************************** Run Notes ***************************** #
+# - Script used to index every .bib file in bib_dir, report references  #
+#       entered more than once, & build .bib file with only the         #
+#       references cited in tex_file                                    #
+#                                                                       #
+# - Key, type, title, year, DOI, & text of each entry are saved to      #
+#       index_file, along with size & modification time of its .bib     #
+#       file; only .bib files that changed since the last run are       #
+#       parsed again                                                    #
+#                                                                       #
+# - Entries found more than once are saved to duplicates_file:          #
+#       + 'Duplicate key': same key (case is ignored, as in BibTeX)     #
+#           with the same fields                                        #
+#       + 'Conflicting key': same key with different fields (BibTeX     #
+#           only uses the first one it reads)                           #
+#       + 'Same DOI' & 'Same title': different keys with the same DOI   #
+#           (from doi or doi.org url field) or the same title & year    #
+#       + before adding a reference, search index_file or               #
+#           duplicates_file instead of every .bib file                  #
+#                                                                       #
+# - Keys cited in tex_file (& files it includes with \input or          #
+#       \include) are collected from \cite-like commands & \nocite      #
+#       + entries are taken from .bib files listed in tex_file's        #
+#           \bibliography command, in that order (names are matched     #
+#           without regard to case); entries they crossref are added    #
+#       + entries are written to <tex_file name>_refs.bib in order of   #
+#           first citation; change \bibliography command to             #
+#           \bibliography{<tex_file name>_refs} to use it               #
+#       + cited keys not found in any .bib file are printed             #
+# ********************************************************************* #
+
+# --------------- #
+# Import Packages #
+# --------------- #
+import os
+import re
+import json
+import pandas as pd
+from pathlib import Path
+
+# ----------------------- #
+# Define Necessary Inputs #
+# ----------------------- #
+# Dir containing .bib files
+bib_dir = Path('.')
+
+# Report whose citations are used to build trimmed .bib file; set to None to only index .bib files
+tex_file = bib_dir / 'FSRI_Report.tex'
+
+# Suffix added to name of tex file to name trimmed .bib file; .bib files with this suffix aren't indexed
+trimmed_suffix = '_refs'
+
+index_file = bib_dir / 'bib_index.json'
+duplicates_file = bib_dir / 'bib_duplicates.csv'
+
+# Commands used to cite references (e.g. \cite, \citep, \citet, \citeauthor, \nocite), with their keys
+cite_pattern = re.compile(r'\\(?:no)?cite[a-zA-Z]*\*?\s*(?:\[[^\]]*\]\s*){0,2}\{([^}]*)\}')
+
+# Files included by tex file & .bib files it uses
+input_pattern = re.compile(r'\\(?:input|include)\s*\{([^}]*)\}')
+bibliography_pattern = re.compile(r'\\bibliography\s*\{([^}]*)\}')
+
+# Start of each entry in .bib file (entry type & opening brace or parenthesis)
+entry_pattern = re.compile(r'^[ \t]*@[ \t]*([A-Za-z]+)[ \t]*([{(])', re.MULTILINE)
+
+# Entry types that aren't references
+skipped_types = ['comment', 'string', 'preamble']
+
+# ---------------------- #
+# User-Defined Functions #
+# ---------------------- #
+def get_source_key(file_path):
+    # Key identifying current version of file
+    file_stats = os.stat(file_path)
+    return(f'{file_stats.st_size}:{file_stats.st_mtime_ns}')
+
+def find_closing(text, start):
+    # Get position of brace or parenthesis closing the one at text[start] (-1 if it isn't closed)
+    #   + nested braces are counted; entries opened with '(' are closed by the first ')' outside braces
+    closing = '}' if text[start] == '{' else ')'
+    depth = 0
+    for pos in range(start + 1, len(text)):
+        if text[pos] == '{':
+            depth += 1
+        elif text[pos] == '}' and depth > 0:
+            depth -= 1
+        elif text[pos] == closing and depth == 0:
+            return(pos)
+
+    return(-1)
+
+def parse_fields(body):
+    # Parse 'name = value' fields of entry body (text after key) into dict of lowercase names & raw values
+    fields = {}
+    pos = 0
+    while True:
+        match = re.compile(r'\s*,?\s*([A-Za-z][\w\-:.]*)\s*=\s*').match(body, pos)
+        if match is None:
+            return(fields)
+
+        # Values are {...}, "...", or bare words & numbers, possibly joined with '#'; commas only end a value
+        #   outside of braces & quotes
+        pos, value_start = match.end(), match.end()
+        depth, in_quotes = 0, False
+        while pos < len(body) and (depth > 0 or in_quotes or body[pos] != ','):
+            if body[pos] == '{':
+                depth += 1
+            elif body[pos] == '}':
+                depth -= 1
+            elif body[pos] == '"' and depth == 0:
+                in_quotes = not in_quotes
+            pos += 1
+        fields[match.group(1).lower()] = body[value_start:pos].strip()
+
+def parse_bib_file(bib_path):
+    # Parse entries of .bib file; returns list of dicts with key, type, line, fields, & text of each entry
+    text = bib_path.read_text(encoding='utf-8', errors='replace')
+    entries = []
+    pos = 0
+    while True:
+        match = entry_pattern.search(text, pos)
+        if match is None:
+            return(entries)
+
+        end = find_closing(text, match.end() - 1)
+        if end < 0:
+            end = len(text) - 1
+        pos = end + 1
+        if match.group(1).lower() in skipped_types:
+            continue
+
+        key, _, body = text[match.end():end].partition(',')
+        entries.append({'key': key.strip(), 'type': match.group(1).upper(), 'line': text.count('\n', 0, match.start()) + 1,
+                        'fields': parse_fields(body), 'text': text[match.start():end + 1].strip()})
+
+def strip_value(value):
+    # Remove braces, quotes, & whitespace around field value
+    return(re.sub(r'\s+', ' ', value.strip().strip('"').replace('{', '').replace('}', '')).strip())
+
+def normalize_title(title):
+    # Lowercase title with TeX commands, braces, & punctuation removed (used to match titles)
+    title = re.sub(r'\\[A-Za-z]+', ' ', title)
+    return(' '.join(re.sub(r'[^a-z0-9]+', ' ', title.lower()).split()))
+
+def get_doi(fields):
+    # Get lowercase DOI of entry from its doi field or a doi.org url ('' if it has neither)
+    doi = strip_value(fields.get('doi', ''))
+    if not doi:
+        url_doi = re.search(r'doi\.org/(10\.\S+)', strip_value(fields.get('url', '')))
+        doi = url_doi.group(1) if url_doi else ''
+    return(re.sub(r'^(https?://(dx\.)?doi\.org/|doi:)', '', doi.lower()).strip())
+
+def index_bib_file(bib_path):
+    # Index entries of .bib file with fields used to find duplicates
+    index_entries = []
+    for entry in parse_bib_file(bib_path):
+        fields = entry['fields']
+        index_entries.append({'key': entry['key'], 'type': entry['type'], 'line': entry['line'],
+                              'title': strip_value(fields.get('title', '')),
+                              'year': strip_value(fields.get('year', '')), 'doi': get_doi(fields),
+                              'crossref': strip_value(fields.get('crossref', '')),
+                              'fields': {name: strip_value(value) for name, value in fields.items()},
+                              'text': entry['text']})
+
+    return(index_entries)
+
+def update_bib_index(bib_dir, index_file):
+    # Load index of .bib files in bib_dir (except trimmed .bib files), parsing only files that are new or changed
+    #   since index was saved
+    bib_index = {}
+    if index_file.exists():
+        with open(index_file, encoding='utf-8') as index_json:
+            bib_index = json.load(index_json)
+
+    bib_paths = sorted(bib_path for bib_path in bib_dir.glob('*.bib') if not bib_path.stem.endswith(trimmed_suffix))
+    bib_index = {name: file_index for name, file_index in bib_index.items()
+                 if name in [bib_path.name for bib_path in bib_paths]}
+    num_parsed = 0
+    for bib_path in bib_paths:
+        source_key = get_source_key(bib_path)
+        if bib_index.get(bib_path.name, {}).get('source_key') != source_key:
+            bib_index[bib_path.name] = {'source_key': source_key, 'entries': index_bib_file(bib_path)}
+            num_parsed += 1
+
+    if num_parsed:
+        with open(index_file, 'w', encoding='utf-8') as index_json:
+            json.dump(bib_index, index_json, indent=1)
+    print(f'Indexed {sum(len(file_index["entries"]) for file_index in bib_index.values())} entries in '
+          f'{len(bib_index)} .bib files ({num_parsed} parsed, {len(bib_index) - num_parsed} from index)')
+
+    return(bib_index)
+
+def get_entry_table(bib_index):
+    # Table of every indexed entry with file & normalized key, title, & DOI used to match entries
+    entry_table = pd.DataFrame([{'File': file_name, **entry} for file_name, file_index in bib_index.items()
+                                for entry in file_index['entries']])
+    entry_table['Location'] = entry_table['File'] + ':' + entry_table['line'].astype(str)
+    entry_table['key_match'] = entry_table['key'].str.lower()
+    entry_table['title_match'] = entry_table['title'].map(normalize_title) + '|' + entry_table['year']
+    entry_table['field_match'] = entry_table['fields'].map(lambda fields: json.dumps(fields, sort_keys=True).lower())
+    return(entry_table)
+
+def find_duplicates(entry_table):
+    # Find entries entered more than once; returns df of 'Issue', 'Value', 'Keys', & 'Locations' for each
+    issues = []
+    for key_match, entries in entry_table.groupby('key_match', sort=False):
+        if len(entries) > 1:
+            issue = 'Duplicate key' if entries['field_match'].nunique() == 1 else 'Conflicting key'
+            issues.append([issue, entries['key'].iloc[0], entries])
+
+    matches = [['Same DOI', 'doi', entry_table['doi'] != ''],
+               ['Same title', 'title_match', entry_table['title'].map(normalize_title) != '']]
+    for issue, column, has_value in matches:
+        for value, entries in entry_table[has_value].groupby(column, sort=False):
+            if entries['key_match'].nunique() > 1:
+                issues.append([issue, entries['doi'].iloc[0] if column == 'doi' else entries['title'].iloc[0],
+                               entries])
+
+    return(pd.DataFrame([{'Issue': issue, 'Value': value, 'Keys': '; '.join(entries['key']),
+                          'Locations': '; '.join(entries['Location'])} for issue, value, entries in issues],
+                        columns=['Issue', 'Value', 'Keys', 'Locations']))
+
+def read_tex(tex_path):
+    # Read text of tex file & files it includes, with comments removed
+    text = re.sub(r'(?<!\\)%.*', '', tex_path.read_text(encoding='utf-8', errors='replace'))
+    for input_name in input_pattern.findall(text):
+        input_path = tex_path.parent / input_name.strip()
+        input_path = input_path if input_path.suffix == '.tex' else input_path.with_name(input_path.name + '.tex')
+        if input_path.exists():
+            text += '\n' + read_tex(input_path)
+
+    return(text)
+
+def get_cited_keys(tex_text):
+    # Get keys cited in tex text in order of first citation ('*' if \nocite{*} is used)
+    keys = [key.strip() for keys in cite_pattern.findall(tex_text) for key in keys.split(',') if key.strip()]
+    return(list(dict.fromkeys(keys)))
+
+def build_trimmed_bib(entry_table, bib_names, cited_keys):
+    # Build text of .bib file with cited entries (& entries they crossref) from bib files in bib_names
+    #   + first entry with a key in order of bib_names is used, as in BibTeX
+    #   + returns (text, cited keys with '*' replaced by every key, keys not found)
+    file_order = {file_name.lower(): num for num, file_name in enumerate(bib_names)}
+    used_entries = entry_table[entry_table['File'].str[:-4].str.lower().isin(list(file_order))].copy()
+    used_entries['order'] = used_entries['File'].str[:-4].str.lower().map(file_order)
+    used_entries = used_entries.sort_values(['order', 'line']).drop_duplicates('key_match').set_index('key_match')
+
+    if '*' in cited_keys:
+        cited_keys = [key for key in cited_keys if key != '*']
+        named_keys = {key.lower() for key in cited_keys}
+        cited_keys += [key for key in used_entries['key'] if key.lower() not in named_keys]
+    selected_keys, missing_keys = [], []
+    for key in cited_keys:
+        if key.lower() in used_entries.index:
+            selected_keys.append(key.lower())
+        else:
+            missing_keys.append(key)
+
+    # Entries referenced with crossref must follow entries that reference them
+    crossrefs = [used_entries.loc[key, 'crossref'].lower() for key in selected_keys if used_entries.loc[key, 'crossref']]
+    selected_keys = list(dict.fromkeys(selected_keys))
+    selected_keys += [key for key in dict.fromkeys(crossrefs) if key in used_entries.index and key not in selected_keys]
+
+    header = f'% Entries cited in report, taken from {", ".join(name + ".bib" for name in bib_names)}\n\n'
+    return(header + '\n\n'.join(used_entries.loc[selected_keys, 'text']) + '\n', cited_keys, list(dict.fromkeys(missing_keys)))
+
+# ----------------- #
+# Main Body of Code #
+# ----------------- #
+if __name__ == '__main__':
+    bib_index = update_bib_index(bib_dir, index_file)
+    entry_table = get_entry_table(bib_index)
+
+    # Report entries found more than once
+    duplicates = find_duplicates(entry_table)
+    duplicates.to_csv(duplicates_file, index=False)
+    for issue, issue_count in duplicates['Issue'].value_counts().items():
+        print(f'    {issue_count} x {issue}')
+    print(f'Saved {len(duplicates)} issue(s) to {duplicates_file}')
+
+    # Build .bib file with only the entries cited in report
+    if tex_file is not None:
+        tex_text = read_tex(tex_file)
+        bib_names = [name.strip() for names in bibliography_pattern.findall(tex_text) for name in names.split(',')]
+        file_names = {bib_path.stem.lower(): bib_path.stem for bib_path in bib_dir.glob('*.bib')}
+        bib_names = [file_names.get(name.lower(), name) for name in bib_names if name.lower() != f'{tex_file.stem}{trimmed_suffix}'.lower()]
+
+        bib_text, cited_keys, missing_keys = build_trimmed_bib(entry_table, bib_names, get_cited_keys(tex_text))
+        trimmed_path = tex_file.with_name(f'{tex_file.stem}{trimmed_suffix}.bib')
+        with open(trimmed_path, 'w', encoding='utf-8') as trimmed_bib:
+            trimmed_bib.write(bib_text)
+
+        print(f'Saved {len(cited_keys) - len(missing_keys)} of {len(cited_keys)} cited entries to {trimmed_path}')
+        if missing_keys:
+            print('    Cited keys not found: ' + ', '.join(missing_keys))